@@ -2,13 +2,17 @@ import getpass
 import json
 import os
 import sys
-from typing import Any, Dict
+from dataclasses import dataclass, field
+from typing import Any, Dict, NamedTuple, Tuple
 
 from mcp.server.fastmcp import FastMCP
 
 # Workaround for os.getlogin issues in some environments
 os.getlogin = getpass.getuser
 
+# Only log negotiation details for interactive sessions or when explicitly requested
+_VERBOSE = sys.stderr.isatty() or bool(os.environ.get("MCP_VERBOSE"))
+
 # Create an MCP server with custom capabilities
 mcp = FastMCP("CapabilityNegotiationDemo")
 
@@ -51,12 +55,57 @@ mcp.server_capabilities = {
     },
 }
 
+
+class FeatureStatus(NamedTuple):
+    """Negotiated status of a single feature"""
+
+    supported: bool
+    client_supported: bool
+    server_supported: bool
+    # Additional (key, value) parameters from both sides, e.g. ("server_version", "dev")
+    extras: Tuple[Tuple[str, Any], ...] = ()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Flatten the status into its JSON representation"""
+        return {
+            "supported": self.supported,
+            "client_supported": self.client_supported,
+            "server_supported": self.server_supported,
+            **dict(self.extras),
+        }
+
+
+# Unavailability reasons indexed by (not client_supported) * 2 + (not server_supported)
+_REASONS = (
+    None,
+    "Server does not support this feature",
+    "Client does not support this feature",
+    "Neither client nor server supports this feature",
+)
+
+
+def _unavailable_reason(status: FeatureStatus):
+    """Look up why a feature is unavailable, or None if it is available"""
+    return _REASONS[(not status.client_supported) * 2 + (not status.server_supported)]
+
+
+def _features_to_dict(features: Dict[str, FeatureStatus]) -> Dict[str, Any]:
+    """Convert a mapping of feature statuses for JSON serialization"""
+    return {name: status.to_dict() for name, status in features.items()}
+
+
+@dataclass(slots=True)
+class ClientCaps:
+    """Client capabilities and negotiation results for the current session"""
+
+    recorded: bool = False
+    details: Dict[str, Any] = field(default_factory=dict)
+    negotiated_features: Dict[str, FeatureStatus] = field(default_factory=dict)
+    available_features: Dict[str, Any] = field(default_factory=dict)
+
+
 # Track client capabilities
-client_capabilities = {
-    "recorded": False,
-    "details": {},
-    "negotiated_features": {},
-}
+client_capabilities = ClientCaps()
 
 
 # Handle initialization and capability negotiation
@@ -68,60 +117,70 @@ def handle_initialize(params):
     This is where the client and server exchange capabilities and agree
     on which features to use during the session.
     """
-    sys.stderr.write("\n=== CAPABILITY NEGOTIATION STARTED ===\n")
-
     # Extract client capabilities
     client_caps = params.get("capabilities", {})
     client_features = client_caps.get("features", {})
 
     # Record client details
-    client_capabilities["recorded"] = True
-    client_capabilities["details"] = client_caps
-
-    # Log client info
-    client_info = params.get("client_info", {})
-    sys.stderr.write(
-        f"Client: {client_info.get('name', 'Unknown')} {client_info.get('version', '')}\n"
-    )
-    sys.stderr.write(
-        f"Protocol version: {client_caps.get('protocol_version', 'Unknown')}\n"
-    )
+    client_capabilities.recorded = True
+    client_capabilities.details = client_caps
+
+    # Collect log lines and emit them with a single write
+    log_lines = []
+    if _VERBOSE:
+        client_info = params.get("client_info", {})
+        log_lines.append("\n=== CAPABILITY NEGOTIATION STARTED ===")
+        log_lines.append(
+            f"Client: {client_info.get('name', 'Unknown')} {client_info.get('version', '')}"
+        )
+        log_lines.append(
+            f"Protocol version: {client_caps.get('protocol_version', 'Unknown')}"
+        )
 
     # Determine which features both client and server support
     negotiated_features = {}
+    available_features = {}
 
     for feature_name, server_feature in mcp.server_capabilities["features"].items():
         client_feature = client_features.get(feature_name, {})
         client_supported = client_feature.get("supported", False)
         server_supported = server_feature.get("supported", False)
 
-        negotiated = {
-            "supported": client_supported and server_supported,
-            "client_supported": client_supported,
-            "server_supported": server_supported,
-        }
-
         # Add any additional parameters from both sides
-        for key, value in server_feature.items():
-            if key != "supported":
-                negotiated[f"server_{key}"] = value
-
-        for key, value in client_feature.items():
-            if key != "supported":
-                negotiated[f"client_{key}"] = value
+        extras = tuple(
+            (f"server_{key}", value)
+            for key, value in server_feature.items()
+            if key != "supported"
+        ) + tuple(
+            (f"client_{key}", value)
+            for key, value in client_feature.items()
+            if key != "supported"
+        )
 
+        negotiated = FeatureStatus(
+            supported=client_supported and server_supported,
+            client_supported=client_supported,
+            server_supported=server_supported,
+            extras=extras,
+        )
         negotiated_features[feature_name] = negotiated
+        if negotiated.supported:
+            available_features[feature_name] = negotiated.to_dict()
 
         # Log the negotiation results
-        status = "✅ AVAILABLE" if negotiated["supported"] else "❌ UNAVAILABLE"
-        sys.stderr.write(
-            f"Feature '{feature_name}': {status} (Client: {'✓' if client_supported else '✗'}, Server: {'✓' if server_supported else '✗'})\n"
-        )
+        if _VERBOSE:
+            status = "✅ AVAILABLE" if negotiated.supported else "❌ UNAVAILABLE"
+            log_lines.append(
+                f"Feature '{feature_name}': {status} (Client: {'✓' if client_supported else '✗'}, Server: {'✓' if server_supported else '✗'})"
+            )
 
     # Store negotiation results
-    client_capabilities["negotiated_features"] = negotiated_features
+    client_capabilities.negotiated_features = negotiated_features
+    client_capabilities.available_features = available_features
 
-    sys.stderr.write("=== CAPABILITY NEGOTIATION COMPLETED ===\n\n")
+    if _VERBOSE:
+        log_lines.append("=== CAPABILITY NEGOTIATION COMPLETED ===\n\n")
+        sys.stderr.write("\n".join(log_lines))
 
     # Return our server capabilities to the client
     return {"capabilities": mcp.server_capabilities}
@@ -135,10 +194,10 @@ def get_client_capabilities() -> Dict[str, Any]:
 
     This shows what features the client advertised support for
     """
-    if not client_capabilities["recorded"]:
+    if not client_capabilities.recorded:
         return {"error": "No client capabilities recorded yet. Initialize first."}
 
-    return client_capabilities["details"]
+    return client_capabilities.details
 
 
 @mcp.tool()
@@ -158,20 +217,14 @@ def get_negotiated_features() -> Dict[str, Any]:
 
     This shows which features both client and server support
     """
-    if not client_capabilities["recorded"]:
+    if not client_capabilities.recorded:
         return {
             "error": "No capability negotiation has occurred yet. Initialize first."
         }
 
-    # Extract just the supported features for clarity
-    available_features = {}
-    for feature_name, details in client_capabilities["negotiated_features"].items():
-        if details["supported"]:
-            available_features[feature_name] = details
-
     return {
-        "available_features": available_features,
-        "all_features": client_capabilities["negotiated_features"],
+        "available_features": client_capabilities.available_features,
+        "all_features": _features_to_dict(client_capabilities.negotiated_features),
     }
 
 
@@ -185,42 +238,35 @@ def check_feature_availability(feature_name: str) -> Dict[str, Any]:
 
     Returns details about the feature's availability and support status
     """
-    if not client_capabilities["recorded"]:
+    if not client_capabilities.recorded:
         return {
             "error": "No capability negotiation has occurred yet. Initialize first."
         }
 
-    if feature_name not in client_capabilities["negotiated_features"]:
+    if feature_name not in client_capabilities.negotiated_features:
         return {
             "feature": feature_name,
             "available": False,
             "reason": "Feature not defined in server capabilities",
         }
 
-    feature_details = client_capabilities["negotiated_features"][feature_name]
-    is_available = feature_details["supported"]
+    feature_details = client_capabilities.negotiated_features[feature_name]
+    is_available = feature_details.supported
 
     result = {
         "feature": feature_name,
         "available": is_available,
-        "client_supported": feature_details["client_supported"],
-        "server_supported": feature_details["server_supported"],
+        "client_supported": feature_details.client_supported,
+        "server_supported": feature_details.server_supported,
     }
 
     # Add reason if not available
     if not is_available:
-        if not feature_details["client_supported"]:
-            if not feature_details["server_supported"]:
-                result["reason"] = "Neither client nor server supports this feature"
-            else:
-                result["reason"] = "Client does not support this feature"
-        else:
-            result["reason"] = "Server does not support this feature"
+        result["reason"] = _unavailable_reason(feature_details)
 
     # Add detailed parameters if available
-    for key, value in feature_details.items():
-        if key not in ["supported", "client_supported", "server_supported"]:
-            result[key] = value
+    for key, value in feature_details.extras:
+        result[key] = value
 
     return result
 
@@ -235,31 +281,24 @@ def use_feature(feature_name: str) -> Dict[str, Any]:
 
     Returns success or error based on feature availability
     """
-    if not client_capabilities["recorded"]:
+    if not client_capabilities.recorded:
         return {
             "error": "No capability negotiation has occurred yet. Initialize first."
         }
 
     # Check if the feature is available
-    if feature_name not in client_capabilities["negotiated_features"]:
+    if feature_name not in client_capabilities.negotiated_features:
         return {
             "success": False,
             "feature": feature_name,
             "error": "Feature not defined in capabilities",
         }
 
-    feature_details = client_capabilities["negotiated_features"][feature_name]
-    is_available = feature_details["supported"]
+    feature_details = client_capabilities.negotiated_features[feature_name]
+    is_available = feature_details.supported
 
     if not is_available:
-        if not feature_details["client_supported"]:
-            if not feature_details["server_supported"]:
-                reason = "Neither client nor server supports this feature"
-            else:
-                reason = "Client does not support this feature"
-        else:
-            reason = "Server does not support this feature"
-
+        reason = _unavailable_reason(feature_details)
         return {
             "success": False,
             "feature": feature_name,
@@ -271,7 +310,7 @@ def use_feature(feature_name: str) -> Dict[str, Any]:
         "success": True,
         "feature": feature_name,
         "message": f"Successfully used the '{feature_name}' feature",
-        "details": feature_details,
+        "details": feature_details.to_dict(),
     }
 
 
@@ -285,19 +324,21 @@ def get_server_capabilities_resource() -> str:
 @mcp.resource("capabilities://client")
 def get_client_capabilities_resource() -> str:
     """Get the client's capabilities as a resource"""
-    if not client_capabilities["recorded"]:
+    if not client_capabilities.recorded:
         return json.dumps({"error": "No client capabilities recorded yet"})
 
-    return json.dumps(client_capabilities["details"], indent=2)
+    return json.dumps(client_capabilities.details, indent=2)
 
 
 @mcp.resource("capabilities://negotiated")
 def get_negotiated_capabilities_resource() -> str:
     """Get the negotiated capabilities as a resource"""
-    if not client_capabilities["recorded"]:
+    if not client_capabilities.recorded:
         return json.dumps({"error": "No capability negotiation has occurred yet"})
 
-    return json.dumps(client_capabilities["negotiated_features"], indent=2)
+    return json.dumps(
+        _features_to_dict(client_capabilities.negotiated_features), indent=2
+    )
 
 
 # Capability-aware features that adapt based on client support
@@ -308,7 +349,7 @@ def demonstrate_adaptive_behavior() -> Dict[str, Any]:
 
     This tool shows different behavior depending on what the client supports
     """
-    if not client_capabilities["recorded"]:
+    if not client_capabilities.recorded:
         return {
             "error": "No capability negotiation has occurred yet. Initialize first."
         }
@@ -318,15 +359,15 @@ def demonstrate_adaptive_behavior() -> Dict[str, Any]:
         "adaptive_behaviors": [],
     }
 
-    negotiated = client_capabilities["negotiated_features"]
+    negotiated = client_capabilities.negotiated_features
 
     # Check for sampling support
-    if negotiated.get("sampling", {}).get("supported", False):
+    if "sampling" in negotiated and negotiated["sampling"].supported:
         response["adaptive_behaviors"].append(
             {
                 "feature": "sampling",
                 "behavior": "Server can request LLM operations from the client",
-                "details": negotiated["sampling"],
+                "details": negotiated["sampling"].to_dict(),
             }
         )
     else:
@@ -339,12 +380,12 @@ def demonstrate_adaptive_behavior() -> Dict[str, Any]:
         )
 
     # Check for progress tracking support
-    if negotiated.get("progress", {}).get("supported", False):
+    if "progress" in negotiated and negotiated["progress"].supported:
         response["adaptive_behaviors"].append(
             {
                 "feature": "progress",
                 "behavior": "Server can provide real-time progress updates",
-                "details": negotiated["progress"],
+                "details": negotiated["progress"].to_dict(),
             }
         )
     else:
@@ -357,12 +398,12 @@ def demonstrate_adaptive_behavior() -> Dict[str, Any]:
         )
 
     # Check for notifications support
-    if negotiated.get("notifications", {}).get("supported", False):
+    if "notifications" in negotiated and negotiated["notifications"].supported:
         response["adaptive_behaviors"].append(
             {
                 "feature": "notifications",
                 "behavior": "Server can send real-time notifications for resource changes",
-                "details": negotiated["notifications"],
+                "details": negotiated["notifications"].to_dict(),
             }
         )
     else:
@@ -1,15 +1,18 @@
 import asyncio
+import functools
 import getpass
+import itertools
 import json
 import logging
 import os
 import sys
-from typing import Any, Dict
+from operator import itemgetter
+from typing import Any, Callable, Dict, Tuple
 
 import uvicorn
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from mcp.server.fastmcp import FastMCP
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response
 
 # Workaround for os.getlogin issues in some environments
 os.getlogin = getpass.getuser
@@ -28,8 +31,9 @@ mcp = FastMCP("CustomTransportDemo")
 # Create the FastAPI application
 app = FastAPI(title="MCP Custom Transports Demo")
 
-# Store active WebSocket connections
+# Store active WebSocket connections, keyed by integer connection ID
 websocket_connections = {}
+_conn_counter = itertools.count()
 
 
 # Basic MCP tools and resources for testing transports
@@ -78,6 +82,47 @@ def get_transport_resource() -> str:
     )
 
 
+# Per-tool argument extractors for the raw tools/call params, paired with
+# the tool they feed
+_echo_get = itemgetter("message")
+
+
+def _echo_args(params: Dict) -> Tuple[Any, ...]:
+    return (_echo_get(params["params"]),)
+
+
+_TOOL_HANDLERS: Dict[
+    str, Tuple[Callable[[Dict], Tuple[Any, ...]], Callable[..., Any]]
+] = {
+    "echo": (_echo_args, echo),
+    "get_transport_info": (lambda params: (), get_transport_info),
+}
+
+
+# The initialize result is identical for every client, so it is serialized
+# once and only the request id is spliced in per handshake
+SERVER_INFO = {"name": "MCP Custom Transport Demo", "version": "1.0.0"}
+
+
+@functools.cache
+def _initialize_result_json() -> str:
+    """Serialized initialize result, computed on first use"""
+    return json.dumps(
+        {"capabilities": mcp.server_capabilities, "serverInfo": SERVER_INFO}
+    )
+
+
+def _initialize_response_json(msg_id: Any) -> str:
+    """Build the full initialize response around the cached result"""
+    return (
+        '{"jsonrpc": "2.0", "id": '
+        + json.dumps(msg_id)
+        + ', "result": '
+        + _initialize_result_json()
+        + "}"
+    )
+
+
 # HTTP Transport Implementation
 
 
@@ -87,6 +132,12 @@ async def mcp_http_endpoint(request_data: Dict):
     try:
         logger.info(f"Received HTTP request: {json.dumps(request_data)}")
 
+        # Handshakes reuse the pre-serialized initialize result
+        if request_data.get("method") == "initialize":
+            body = _initialize_response_json(request_data.get("id"))
+            logger.info(f"Sending HTTP response: {body}")
+            return Response(content=body, media_type="application/json")
+
         # Process the MCP request
         response = await process_mcp_message(request_data)
         logger.info(f"Sending HTTP response: {json.dumps(response)}")
@@ -108,11 +159,11 @@ async def mcp_websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for MCP connections"""
     await websocket.accept()
 
-    # Generate a unique connection ID
-    connection_id = f"ws_{id(websocket)}"
+    # Assign a unique connection ID
+    connection_id = next(_conn_counter)
     websocket_connections[connection_id] = websocket
 
-    logger.info(f"WebSocket connection established: {connection_id}")
+    logger.info("WebSocket connection established: ws_%d", connection_id)
 
     try:
         while True:
@@ -122,6 +173,13 @@ async def mcp_websocket_endpoint(websocket: WebSocket):
                 message = json.loads(message_text)
                 logger.info(f"Received WebSocket message: {json.dumps(message)}")
 
+                # Handshakes reuse the pre-serialized initialize result
+                if message.get("method") == "initialize":
+                    body = _initialize_response_json(message.get("id"))
+                    logger.info(f"Sending WebSocket response: {body}")
+                    await websocket.send_text(body)
+                    continue
+
                 # Process the message
                 response = await process_mcp_message(message)
 
@@ -137,7 +195,7 @@ async def mcp_websocket_endpoint(websocket: WebSocket):
                 }
                 await websocket.send_json(error_response)
     except WebSocketDisconnect:
-        logger.info(f"WebSocket disconnected: {connection_id}")
+        logger.info("WebSocket disconnected: ws_%d", connection_id)
         if connection_id in websocket_connections:
             del websocket_connections[connection_id]
     except Exception as e:
@@ -162,7 +220,7 @@ async def process_mcp_message(message: Dict) -> Dict:
             "id": message.get("id"),
             "result": {
                 "capabilities": mcp.server_capabilities,
-                "serverInfo": {"name": "MCP Custom Transport Demo", "version": "1.0.0"},
+                "serverInfo": SERVER_INFO,
             },
         }
 
@@ -210,17 +268,24 @@ async def process_mcp_message(message: Dict) -> Dict:
             }
         elif method == "tools/call":
             tool_name = params.get("name")
-            tool_params = params.get("params", {})
-
-            if tool_name == "echo":
-                result = echo(tool_params.get("message", ""))
-                return {
-                    "jsonrpc": "2.0",
-                    "id": message.get("id"),
-                    "result": {"result": result},
-                }
-            elif tool_name == "get_transport_info":
-                result = get_transport_info()
+            handler = _TOOL_HANDLERS.get(tool_name)
+
+            if handler is not None:
+                get_args, tool = handler
+                # Only a missing parameter is a -32602; errors raised by the
+                # tool itself are left to the caller
+                try:
+                    args = get_args(params)
+                except KeyError as e:
+                    return {
+                        "jsonrpc": "2.0",
+                        "id": message.get("id"),
+                        "error": {
+                            "code": -32602,
+                            "message": f"Missing parameter for {tool_name}: {e}",
+                        },
+                    }
+                result = tool(*args)
                 return {
                     "jsonrpc": "2.0",
                     "id": message.get("id"),
@@ -283,9 +348,14 @@ async def startup_event():
 class StdioTransport:
     """Standard IO transport for MCP (this is built into FastMCP)"""
 
+    # Longest STDIO message accepted; longer lines are dropped
+    MAX_LINE_BYTES = 16 * 1024 * 1024
+
     def __init__(self):
         self.reader = None
         self.writer = None
+        self.queue = None
+        self._pump_task = None
 
     async def start(self):
         """Start the STDIO transport"""
@@ -302,13 +372,61 @@ class StdioTransport:
             self.writer_transport, protocol=None, reader=None, loop=loop
         )
 
+        # Read stdin in bulk and frame messages in the background
+        self.queue = asyncio.Queue()
+        self._pump_task = asyncio.create_task(self._pump())
+
+    async def _pump(self):
+        """Read STDIO in large chunks and queue every complete line"""
+        buffer = bytearray()
+        discarding = False
+        try:
+            while True:
+                chunk = await self.reader.read(self.reader._limit)
+                if not chunk:
+                    break
+
+                # Skip the rest of an oversized line up to its newline
+                if discarding:
+                    newline = chunk.find(b"\n")
+                    if newline == -1:
+                        continue
+                    chunk = chunk[newline + 1 :]
+                    discarding = False
+
+                # A single wakeup may carry several pipelined messages
+                buffer += chunk
+                start = 0
+                while (end := buffer.find(b"\n", start)) != -1:
+                    self.queue.put_nowait(bytes(buffer[start:end]))
+                    start = end + 1
+                del buffer[:start]
+
+                if len(buffer) > self.MAX_LINE_BYTES:
+                    logger.error(
+                        "Dropping STDIO message longer than %d bytes",
+                        self.MAX_LINE_BYTES,
+                    )
+                    buffer.clear()
+                    discarding = True
+
+            if buffer and not discarding:
+                self.queue.put_nowait(bytes(buffer))
+        except Exception as e:
+            logger.error(f"Error reading from STDIO: {str(e)}")
+        finally:
+            # None marks end of input, however reading stopped
+            self.queue.put_nowait(None)
+
     async def receive(self):
         """Receive a message from STDIO"""
-        if not self.reader:
+        if not self.queue:
             return None
 
-        line = await self.reader.readline()
-        if not line:
+        line = await self.queue.get()
+        if line is None:
+            # Keep the end-of-input marker for subsequent callers
+            self.queue.put_nowait(None)
             return None
 
         return line.decode("utf-8").strip()
@@ -321,6 +439,17 @@ class StdioTransport:
         self.writer.write(f"{message}\n".encode("utf-8"))
         await self.writer.drain()
 
+    async def close(self):
+        """Stop reading STDIO and close the writer"""
+        if self._pump_task:
+            self._pump_task.cancel()
+            await asyncio.gather(self._pump_task, return_exceptions=True)
+            self._pump_task = None
+
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+
 
 def run_fastapi_server():
     """Run the FastAPI server for HTTP and WebSocket transports"""
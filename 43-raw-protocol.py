@@ -1,23 +1,139 @@
 import getpass
 import json
+import logging
 import os
+import re
 import sys
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional, Union
+
+# Prefer orjson for the per-message JSON work when it is installed
+try:
+    import orjson
+
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+    def _loads(data: Union[bytes, memoryview]) -> Any:
+        return json.loads(bytes(data))
+
+
+# Framing constants for the stdin reader
+_READ_SIZE = 65536
+_OUT_BUF_SIZE = 65536
+# Headers end with a blank line; bare LF line endings are accepted too
+_HEADER_END = re.compile(rb"\r?\n\r?\n")
+_CONTENT_LENGTH = b"Content-Length:"
+_FRAME_HEADER = b"Content-Length: %d\r\n\r\n"
+
+# JSON-RPC envelopes; only the id and the inner payload vary per message
+_RESPONSE_TEMPLATE = b'{"jsonrpc":"2.0","id":%s,"result":%s}'
+_ERROR_TEMPLATE = b'{"jsonrpc":"2.0","id":%s,"error":{"code":%d,"message":%s}}'
+_RESPONSE_PREFIX = b'{"jsonrpc":"2.0","id":'
+
+
+def _compile_response(result: bytes) -> Callable[[Any], bytes]:
+    """Specialize a response builder for a fixed, pre-serialized result"""
+    # Everything after the id is constant, so it is joined once up front
+    suffix = b',"result":' + result + b"}"
+
+    def build(request_id: Any) -> bytes:
+        return _RESPONSE_PREFIX + _dumps(request_id) + suffix
+
+    return build
+
 
 # Workaround for os.getlogin issues in some environments
 os.getlogin = getpass.getuser
 
+# Per-message protocol traces are DEBUG; set MCP_VERBOSE to see them
+logging.basicConfig(
+    level=logging.DEBUG if os.environ.get("MCP_VERBOSE") else logging.WARNING,
+    format="%(message)s",
+    stream=sys.stderr,
+)
+logger = logging.getLogger("raw-protocol")
 
+
+# RawMCPServer is fully annotated so it can be compiled ahead of time with
+# mypyc: copy it to raw_protocol.py and run
+#   mypyc --ignore-missing-imports raw_protocol.py
 class RawMCPServer:
     """Minimal MCP server implementation using raw JSON-RPC"""
 
-    def __init__(self, name: str = "RawMCPDemo"):
+    def __init__(self, name: str = "RawMCPDemo") -> None:
         """Initialize the server with name and basic capabilities"""
-        self.name = name
-        self.initialized = False
-        self.tools = self._create_demo_tools()
-        self.resources = self._create_demo_resources()
-        self.protocol_version = "2023-08-01"
+        self.name: str = name
+        self.initialized: bool = False
+        self.tools: Dict[str, Dict[str, Any]] = self._create_demo_tools()
+        self.resources: Dict[str, str] = self._create_demo_resources()
+        self.resource_mime_types: Dict[str, str] = {
+            uri: "application/json" if uri.endswith(".json") else "text/plain"
+            for uri in self.resources
+        }
+        self.protocol_version: str = "2023-08-01"
+
+        # Server capabilities are static, so build them once
+        self.capabilities: Dict[str, Any] = {
+            "protocolVersion": self.protocol_version,
+            "server": {"name": self.name, "version": "1.0.0"},
+            "features": {
+                "tools": {"supported": True},
+                "resources": {"supported": True},
+                "prompts": {"supported": False},
+                "sampling": {"supported": False},
+            },
+        }
+
+        # Capabilities, tools and resources are fixed after construction, so
+        # their responses are compiled once and only the request id varies
+        self._initialize_response = _compile_response(
+            _dumps({"capabilities": self.capabilities})
+        )
+        self._tools_list_response = _compile_response(
+            _dumps({"tools": list(self.tools.values())})
+        )
+        self._resources_list_response = _compile_response(
+            _dumps(
+                {
+                    "resources": [
+                        {"uri": uri, "mimeType": mime_type}
+                        for uri, mime_type in self.resource_mime_types.items()
+                    ]
+                }
+            )
+        )
+        self._resource_responses: Dict[str, Callable[[Any], bytes]] = {
+            uri: _compile_response(
+                _dumps(
+                    {
+                        "content": {
+                            "uri": uri,
+                            "mimeType": self.resource_mime_types[uri],
+                            "text": text,
+                        }
+                    }
+                )
+            )
+            for uri, text in self.resources.items()
+        }
+
+        # Responses are framed into this buffer, which is reused across batches
+        self._out_buf: bytearray = bytearray(_OUT_BUF_SIZE)
+
+        # Method dispatch table; every handler takes (request_id, params)
+        self._handlers: Dict[str, Callable[[Any, Dict[str, Any]], Optional[bytes]]] = {
+            "initialize": self._handle_initialize,
+            "initialized": self._handle_initialized,
+            "shutdown": self._handle_shutdown,
+            "tools/list": self._handle_tools_list,
+            "tools/call": self._handle_tools_call,
+            "resources/list": self._handle_resources_list,
+            "resources/read": self._handle_resources_read,
+        }
 
     def _create_demo_tools(self) -> Dict[str, Dict[str, Any]]:
         """Create demo tools for testing"""
@@ -60,51 +176,49 @@ class RawMCPServer:
             ),
         }
 
-    def handle_request(self, request_str: str) -> Optional[str]:
+    def handle_request(
+        self, request_bytes: Union[bytes, memoryview]
+    ) -> Optional[bytes]:
         """Process an incoming JSON-RPC request and return a response"""
         try:
             # Log the raw request for debugging
-            sys.stderr.write(f"\n>>> RECEIVED: {request_str}\n")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "\n>>> RECEIVED: %s",
+                    bytes(request_bytes).decode("utf-8", "replace"),
+                )
 
             # Parse the request
-            request = json.loads(request_str)
+            request = _loads(request_bytes)
             method = request.get("method")
             params = request.get("params", {})
             request_id = request.get("id")
 
             # Only respond to requests with ID (ignore notifications)
             if request_id is None:
-                sys.stderr.write(">>> NOTIFICATION (no response required)\n")
+                logger.debug(">>> NOTIFICATION (no response required)")
                 return None
 
             # Dispatch based on method
-            if method == "initialize":
-                response = self._handle_initialize(request_id, params)
-            elif method == "initialized":
-                # Notification, no response needed
-                return None
-            elif method == "shutdown":
-                response = self._handle_shutdown(request_id)
-            elif method == "tools/list":
-                response = self._handle_tools_list(request_id)
-            elif method == "tools/call":
-                response = self._handle_tools_call(request_id, params)
-            elif method == "resources/list":
-                response = self._handle_resources_list(request_id)
-            elif method == "resources/read":
-                response = self._handle_resources_read(request_id, params)
-            else:
+            response: Optional[bytes]
+            handler = self._handlers.get(method)
+            if handler is None:
                 response = self._create_error(
                     request_id, -32601, f"Method not found: {method}"
                 )
+            else:
+                response = handler(request_id, params)
+                if response is None:
+                    return None
 
             # Log the response
-            sys.stderr.write(f"<<< SENDING: {response}\n")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("<<< SENDING: %s", response.decode("utf-8"))
             return response
 
         except json.JSONDecodeError as e:
             error = self._create_error(None, -32700, f"Invalid JSON: {str(e)}")
-            sys.stderr.write(f"<<< ERROR: {error}\n")
+            logger.warning("<<< ERROR: %s", error.decode("utf-8"))
             return error
         except Exception as e:
             error = self._create_error(
@@ -112,47 +226,38 @@ class RawMCPServer:
                 -32000,
                 f"Internal error: {str(e)}",
             )
-            sys.stderr.write(f"<<< ERROR: {error}\n")
+            logger.warning("<<< ERROR: %s", error.decode("utf-8"))
             return error
 
-    def _handle_initialize(self, request_id: Any, params: Dict[str, Any]) -> str:
+    def _handle_initialize(self, request_id: Any, params: Dict[str, Any]) -> bytes:
         """Handle initialization request with capability negotiation"""
         # Extract client capabilities
         client_caps = params.get("capabilities", {})
         client_name = client_caps.get("client", {}).get("name", "Unknown Client")
 
-        sys.stderr.write(f">>> Initializing with client: {client_name}\n")
+        logger.debug(">>> Initializing with client: %s", client_name)
         self.initialized = True
 
-        # Create server capabilities
-        capabilities = {
-            "protocolVersion": self.protocol_version,
-            "server": {"name": self.name, "version": "1.0.0"},
-            "features": {
-                "tools": {"supported": True},
-                "resources": {"supported": True},
-                "prompts": {"supported": False},
-                "sampling": {"supported": False},
-            },
-        }
+        return self._initialize_response(request_id)
 
-        return self._create_response(request_id, {"capabilities": capabilities})
+    def _handle_initialized(self, request_id: Any, params: Dict[str, Any]) -> None:
+        """Handle initialized notification, no response needed"""
+        return None
 
-    def _handle_shutdown(self, request_id: Any) -> str:
+    def _handle_shutdown(self, request_id: Any, params: Dict[str, Any]) -> bytes:
         """Handle shutdown request"""
-        sys.stderr.write(">>> Shutting down\n")
+        logger.debug(">>> Shutting down")
         self.initialized = False
         return self._create_response(request_id, {})
 
-    def _handle_tools_list(self, request_id: Any) -> str:
+    def _handle_tools_list(self, request_id: Any, params: Dict[str, Any]) -> bytes:
         """Handle tools/list request"""
         if not self.initialized:
             return self._create_error(request_id, -32000, "Server not initialized")
 
-        tool_list = list(self.tools.values())
-        return self._create_response(request_id, {"tools": tool_list})
+        return self._tools_list_response(request_id)
 
-    def _handle_tools_call(self, request_id: Any, params: Dict[str, Any]) -> str:
+    def _handle_tools_call(self, request_id: Any, params: Dict[str, Any]) -> bytes:
         """Handle tools/call request"""
         if not self.initialized:
             return self._create_error(request_id, -32000, "Server not initialized")
@@ -178,56 +283,35 @@ class RawMCPServer:
                 request_id, -32000, f"Tool implementation missing: {tool_name}"
             )
 
-        return self._create_response(request_id, {"result": result})
+        # The tool value is the JSON-RPC result itself, no wrapper object
+        return self._create_response(request_id, result)
 
-    def _handle_resources_list(self, request_id: Any) -> str:
+    def _handle_resources_list(self, request_id: Any, params: Dict[str, Any]) -> bytes:
         """Handle resources/list request"""
         if not self.initialized:
             return self._create_error(request_id, -32000, "Server not initialized")
 
-        resources = []
-        for uri in self.resources.keys():
-            resources.append(
-                {
-                    "uri": uri,
-                    "mimeType": "application/json"
-                    if uri.endswith(".json")
-                    else "text/plain",
-                }
-            )
-
-        return self._create_response(request_id, {"resources": resources})
+        return self._resources_list_response(request_id)
 
-    def _handle_resources_read(self, request_id: Any, params: Dict[str, Any]) -> str:
+    def _handle_resources_read(self, request_id: Any, params: Dict[str, Any]) -> bytes:
         """Handle resources/read request"""
         if not self.initialized:
             return self._create_error(request_id, -32000, "Server not initialized")
 
         uri = params.get("uri")
-        if uri not in self.resources:
+        build = self._resource_responses.get(uri) if isinstance(uri, str) else None
+        if build is None:
             return self._create_error(request_id, -32601, f"Resource not found: {uri}")
 
-        content = self.resources[uri]
-        mime_type = "application/json" if uri.endswith(".json") else "text/plain"
+        return build(request_id)
 
-        return self._create_response(
-            request_id,
-            {"content": {"uri": uri, "mimeType": mime_type, "text": content}},
-        )
-
-    def _create_response(self, request_id: Any, result: Dict[str, Any]) -> str:
+    def _create_response(self, request_id: Any, result: Any) -> bytes:
         """Create a JSON-RPC response"""
-        return json.dumps({"jsonrpc": "2.0", "id": request_id, "result": result})
+        return _RESPONSE_TEMPLATE % (_dumps(request_id), _dumps(result))
 
-    def _create_error(self, request_id: Any, code: int, message: str) -> str:
+    def _create_error(self, request_id: Any, code: int, message: str) -> bytes:
         """Create a JSON-RPC error response"""
-        return json.dumps(
-            {
-                "jsonrpc": "2.0",
-                "id": request_id,
-                "error": {"code": code, "message": message},
-            }
-        )
+        return _ERROR_TEMPLATE % (_dumps(request_id), code, _dumps(message))
 
     def run(self) -> None:
         """Run the server, processing input from stdin"""
@@ -236,37 +320,94 @@ class RawMCPServer:
             "This demonstrates the JSON-RPC protocol without SDK abstractions\n"
         )
 
-        buffer = ""
-        content_length = None
+        # Work on raw bytes so Content-Length is measured in bytes, not characters.
+        # Input is read in large chunks and every complete frame in the buffer
+        # is handled before the next read.
+        stdin_fd = sys.stdin.fileno()
+        stdout = sys.stdout.buffer
+        buffer = bytearray()
 
         while True:
-            try:
-                line = sys.stdin.readline()
-                if not line:
+            chunk = os.read(stdin_fd, _READ_SIZE)
+            if not chunk:
+                break
+            buffer += chunk
+            out_len = 0
+
+            while True:
+                match = _HEADER_END.search(buffer)
+                if match is None:
+                    break
+                header_end, body_start = match.span()
+
+                try:
+                    content_length = self._parse_content_length(buffer, header_end)
+                except ValueError as e:
+                    # Drop the malformed header and try to continue processing
+                    logger.error("Error: %s", e)
+                    del buffer[:body_start]
+                    continue
+
+                body_end = body_start + content_length
+                if len(buffer) < body_end:
+                    # Wait for the rest of the body
                     break
 
-                line = line.rstrip()
-
-                # Content-Length header format
-                if line.startswith("Content-Length:"):
-                    content_length = int(line.split(":")[1].strip())
-                elif line == "" and content_length is not None:
-                    # Empty line after header, now read the JSON content
-                    content = sys.stdin.read(content_length)
-                    response = self.handle_request(content)
+                try:
+                    with (
+                        memoryview(buffer) as view,
+                        view[body_start:body_end] as content,
+                    ):
+                        response = self.handle_request(content)
 
                     if response:
-                        # Send the response with proper headers
-                        sys.stdout.write(f"Content-Length: {len(response)}\r\n\r\n")
-                        sys.stdout.write(response)
-                        sys.stdout.flush()
-
-                    # Reset for next message
-                    content_length = None
-
-            except Exception as e:
-                sys.stderr.write(f"Error: {str(e)}\n")
-                # Try to continue processing
+                        # Queue the response with proper headers
+                        out_len = self._frame_response(response, out_len)
+                except Exception as e:
+                    logger.error("Error: %s", e)
+                    # Try to continue processing
+
+                del buffer[:body_end]
+
+            # Send every response from this batch with a single write
+            if out_len:
+                with (
+                    memoryview(self._out_buf) as view,
+                    view[:out_len] as frames,
+                ):
+                    stdout.write(frames)
+                stdout.flush()
+
+    def _frame_response(self, response: bytes, offset: int) -> int:
+        """Copy a framed response into the output buffer, returning its new end"""
+        header = _FRAME_HEADER % len(response)
+        body_start = offset + len(header)
+        end = body_start + len(response)
+
+        if end > len(self._out_buf):
+            # Grow geometrically and keep the larger buffer for later batches
+            new_size = max(end, 2 * len(self._out_buf))
+            self._out_buf.extend(bytes(new_size - len(self._out_buf)))
+
+        self._out_buf[offset:body_start] = header
+        self._out_buf[body_start:end] = response
+        return end
+
+    @staticmethod
+    def _parse_content_length(buffer: bytearray, header_end: int) -> int:
+        """Extract the Content-Length value from the header block"""
+        start = buffer.find(_CONTENT_LENGTH, 0, header_end)
+        if start < 0:
+            raise ValueError("Missing Content-Length header")
+        start += len(_CONTENT_LENGTH)
+
+        end = buffer.find(b"\n", start, header_end)
+        if end < 0:
+            end = header_end
+        content_length = int(buffer[start:end])
+        if content_length < 0:
+            raise ValueError(f"Invalid Content-Length: {content_length}")
+        return content_length
 
 
 # Example usage
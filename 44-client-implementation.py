@@ -1,18 +1,45 @@
 import asyncio
 import getpass
+import itertools
 import json
+import logging
 import os
 import sys
-import uuid
 from typing import Any, Dict, Optional
 
+# Prefer orjson for the per-message JSON work when it is installed
+try:
+    import orjson
+
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+    _loads = json.loads
+
 # Workaround for os.getlogin issues in some environments
 os.getlogin = getpass.getuser
 
+# Per-request protocol traces are DEBUG; set MCP_VERBOSE to see them
+logging.basicConfig(
+    level=logging.DEBUG if os.environ.get("MCP_VERBOSE") else logging.WARNING,
+    format="%(message)s",
+    stream=sys.stderr,
+)
+logger = logging.getLogger("raw-client")
+
 # JSON-RPC Constants
 JSONRPC_VERSION = "2.0"
 MCP_PROTOCOL_VERSION = "2024-11-05"
 
+# Responses larger than this are parsed in a worker thread
+LARGE_RESPONSE_SIZE = 64 * 1024
+# Stream buffer limit, i.e. the largest response line the client accepts
+MAX_RESPONSE_SIZE = 16 * 1024 * 1024
+
 
 class RawMCPClient:
     """
@@ -24,13 +51,19 @@ class RawMCPClient:
     def __init__(self, name: str, version: str = "1.0.0"):
         self.name = name
         self.version = version
-        self.session_id = str(uuid.uuid4())
-        self.request_id = 1
+        # The session id is an opaque token, 8 random bytes are plenty
+        self.session_id = os.urandom(8).hex()
+        self._next_id = itertools.count(1).__next__
         self.initialized = False
         self.server_capabilities = None
         self.server_info = None
         self.available_tools = {}
 
+        # Responses are read by a background task and handed to the
+        # waiting request through a future keyed by request ID
+        self._pending: Dict[Any, asyncio.Future] = {}
+        self._reader_task = None
+
         # Set up client capabilities
         self.capabilities = {
             "protocol_version": MCP_PROTOCOL_VERSION,
@@ -47,17 +80,18 @@ class RawMCPClient:
         If server_command is provided, it will be started as a subprocess.
         Otherwise, it assumes the server is already running on stdin/stdout.
         """
-        self.reader = asyncio.StreamReader()
+        self.reader = asyncio.StreamReader(limit=MAX_RESPONSE_SIZE)
         self.writer = None
 
         if server_command:
             # Start server as subprocess
-            sys.stderr.write(f"Starting server process: {server_command}\n")
+            logger.debug("Starting server process: %s", server_command)
             process = await asyncio.create_subprocess_shell(
                 server_command,
                 stdin=asyncio.subprocess.PIPE,
                 stdout=asyncio.subprocess.PIPE,
                 stderr=sys.stderr,
+                limit=MAX_RESPONSE_SIZE,
             )
 
             self.process = process
@@ -77,12 +111,19 @@ class RawMCPClient:
                 self.writer_transport, protocol=None, reader=None, loop=loop
             )
 
+        # Bind the writer methods once for the request path
+        self._write = self.writer.write
+        self._drain = self.writer.drain
+
+        # Start demultiplexing responses
+        self._reader_task = asyncio.create_task(self._read_loop())
+
         # Initialize the session
         await self.initialize()
 
     async def initialize(self):
         """Initialize the session with the server"""
-        sys.stderr.write("Initializing MCP session...\n")
+        logger.debug("Initializing MCP session...")
 
         # Build initialization request
         init_params = {
@@ -100,12 +141,16 @@ class RawMCPClient:
             self.server_info = response["result"].get("serverInfo")
 
             # Log server info
-            sys.stderr.write(
-                f"Connected to {self.server_info.get('name', 'unknown')} {self.server_info.get('version', '')}\n"
-            )
-            sys.stderr.write(
-                f"Server capabilities: {json.dumps(self.server_capabilities, indent=2)}\n"
-            )
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Connected to %s %s",
+                    self.server_info.get("name", "unknown"),
+                    self.server_info.get("version", ""),
+                )
+                logger.debug(
+                    "Server capabilities: %s",
+                    json.dumps(self.server_capabilities, indent=2),
+                )
 
             # Get available tools
             await self.list_tools()
@@ -115,8 +160,8 @@ class RawMCPClient:
             error = (
                 response.get("error", {}) if response else {"message": "No response"}
             )
-            sys.stderr.write(
-                f"Initialization failed: {error.get('message', 'Unknown error')}\n"
+            logger.error(
+                "Initialization failed: %s", error.get("message", "Unknown error")
             )
             return False
 
@@ -136,20 +181,22 @@ class RawMCPClient:
             error = (
                 response.get("error", {}) if response else {"message": "No response"}
             )
-            sys.stderr.write(
-                f"Failed to list tools: {error.get('message', 'Unknown error')}\n"
+            logger.error(
+                "Failed to list tools: %s", error.get("message", "Unknown error")
             )
             return []
 
     async def call_tool(self, tool_name: str, params: Dict[str, Any] = None):
         """Call a tool on the server"""
         if not self.initialized:
-            sys.stderr.write("Client not initialized. Call initialize() first.\n")
+            logger.warning("Client not initialized. Call initialize() first.")
             return None
 
         if tool_name not in self.available_tools:
-            sys.stderr.write(
-                f"Tool '{tool_name}' not available. Available tools: {', '.join(self.available_tools.keys())}\n"
+            logger.warning(
+                "Tool '%s' not available. Available tools: %s",
+                tool_name,
+                ", ".join(self.available_tools.keys()),
             )
             return None
 
@@ -162,20 +209,18 @@ class RawMCPClient:
         response = await self.send_request("tools/call", tool_params)
 
         if response and "result" in response:
-            return response["result"].get("result")
+            return response["result"]
         else:
             error = (
                 response.get("error", {}) if response else {"message": "No response"}
             )
-            sys.stderr.write(
-                f"Tool call failed: {error.get('message', 'Unknown error')}\n"
-            )
+            logger.error("Tool call failed: %s", error.get("message", "Unknown error"))
             return None
 
     async def get_resource(self, uri: str):
         """Get a resource from the server"""
         if not self.initialized:
-            sys.stderr.write("Client not initialized. Call initialize() first.\n")
+            logger.warning("Client not initialized. Call initialize() first.")
             return None
 
         # Create resource request
@@ -193,8 +238,8 @@ class RawMCPClient:
             error = (
                 response.get("error", {}) if response else {"message": "No response"}
             )
-            sys.stderr.write(
-                f"Resource request failed: {error.get('message', 'Unknown error')}\n"
+            logger.error(
+                "Resource request failed: %s", error.get("message", "Unknown error")
             )
             return None
 
@@ -208,21 +253,20 @@ class RawMCPClient:
 
         if response and "result" in response:
             self.initialized = False
-            sys.stderr.write("Session shut down successfully\n")
+            logger.debug("Session shut down successfully")
+            if self._reader_task:
+                self._reader_task.cancel()
             return True
         else:
             error = (
                 response.get("error", {}) if response else {"message": "No response"}
             )
-            sys.stderr.write(
-                f"Shutdown failed: {error.get('message', 'Unknown error')}\n"
-            )
+            logger.error("Shutdown failed: %s", error.get("message", "Unknown error"))
             return False
 
     async def send_request(self, method: str, params: Dict):
         """Send a JSON-RPC request and await response"""
-        request_id = self.request_id
-        self.request_id += 1
+        request_id = self._next_id()
 
         # Create the request
         request = {
@@ -233,58 +277,76 @@ class RawMCPClient:
         }
 
         # Format and send the request
-        request_str = json.dumps(request) + "\n"
+        request_bytes = _dumps(request) + b"\n"
 
-        if not self.writer:
-            sys.stderr.write("No connection to server\n")
+        if not self.writer or self._reader_task is None or self._reader_task.done():
+            logger.error("No connection to server")
             return None
 
         # Log outgoing request
-        sys.stderr.write(f"--> Sending: {method} (ID: {request_id})\n")
-
-        # Write request to stdout or subprocess stdin
-        if isinstance(self.writer, asyncio.StreamWriter):
-            self.writer.write(request_str.encode("utf-8"))
-            await self.writer.drain()
-        else:
-            self.writer.write(request_str.encode("utf-8"))
-            await self.writer.drain()
-
-        # Wait for response with matching ID
-        while True:
-            try:
-                if isinstance(self.reader, asyncio.StreamReader):
-                    line = await self.reader.readline()
-                else:
-                    line = await self.reader.readline()
+        logger.debug("--> Sending: %s (ID: %s)", method, request_id)
 
-                if not line:
-                    sys.stderr.write("Connection closed by server\n")
-                    break
+        # Register before writing so a fast response cannot be missed
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
 
+        # Drop the entry however the request ends, including a failed write
+        # or a cancelled caller
+        try:
+            # Write request to stdout or subprocess stdin
+            self._write(request_bytes)
+            await self._drain()
+
+            # Wait for the reader task to deliver the response with matching ID
+            return await future
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _read_loop(self):
+        """Read responses and resolve the pending request with the same ID"""
+        loop = asyncio.get_running_loop()
+        try:
+            async for line in self.reader:
                 # Parse the response
-                response_str = line.decode("utf-8").strip()
-                if response_str:
-                    response = json.loads(response_str)
-
-                    # Check if this is a response to our request
-                    if "id" in response and response["id"] == request_id:
-                        if "error" in response:
-                            sys.stderr.write(
-                                f"<-- Error: {response['error'].get('message')}\n"
-                            )
-                        else:
-                            sys.stderr.write(
-                                f"<-- Received response for ID: {request_id}\n"
-                            )
-                        return response
-            except json.JSONDecodeError:
-                sys.stderr.write(f"Invalid JSON received: {response_str}\n")
-            except Exception as e:
-                sys.stderr.write(f"Error receiving response: {str(e)}\n")
-                break
+                response_str = line.strip()
+                if not response_str:
+                    continue
+
+                try:
+                    if len(response_str) > LARGE_RESPONSE_SIZE:
+                        # Keep the event loop responsive while parsing big results
+                        response = await loop.run_in_executor(
+                            None, _loads, response_str
+                        )
+                    else:
+                        response = _loads(response_str)
+                except json.JSONDecodeError:
+                    logger.warning(
+                        "Invalid JSON received: %s",
+                        response_str.decode("utf-8", "replace"),
+                    )
+                    continue
+
+                future = self._pending.pop(response.get("id"), None)
+                if future is None or future.done():
+                    # Not a response to any of our requests
+                    continue
+
+                if "error" in response:
+                    logger.debug("<-- Error: %s", response["error"].get("message"))
+                else:
+                    logger.debug("<-- Received response for ID: %s", response["id"])
+                future.set_result(response)
 
-        return None
+            logger.warning("Connection closed by server")
+        except Exception as e:
+            logger.error("Error receiving response: %s", e)
+        finally:
+            # Release every request still waiting for a response
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_result(None)
+            self._pending.clear()
 
 
 async def interactive_session(client):
@@ -421,7 +483,7 @@ async def main():
             await interactive_session(client)
 
     except Exception as e:
-        sys.stderr.write(f"Client error: {str(e)}\n")
+        logger.error("Client error: %s", e)
 
     finally:
         # Ensure proper shutdown
@@ -1,98 +1,239 @@
+import asyncio
 import getpass
+import itertools
 import json
+import logging
+import math
 
 # Workaround for os.getlogin issues in some environments
 import os
 import sys
 import threading
 import time
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Any
 
+import numpy as np
 from mcp.server.fastmcp import FastMCP
 
+# Prefer orjson for serializing resources when it is installed
+try:
+    import orjson
+
+    def _dumps(obj: Any, indent: bool = False) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+except ImportError:
+
+    def _dumps(obj: Any, indent: bool = False) -> str:
+        return json.dumps(obj, indent=2 if indent else None)
+
+
 os.getlogin = getpass.getuser
 
+# Per-tick traces are DEBUG; set MCP_VERBOSE to see them
+logging.basicConfig(
+    level=logging.DEBUG if os.environ.get("MCP_VERBOSE") else logging.INFO,
+    format="%(message)s",
+    stream=sys.stderr,
+)
+logger = logging.getLogger("notification-demo")
+
 # Create an MCP server
 mcp = FastMCP("NotificationDemo")
 
+# Timestamps formatted within this window reuse the cached ISO string
+STAMP_WINDOW_SEC = 0.05
+_last_stamp_s = 0.0
+_last_stamp_iso = ""
+
+
+def _now_iso() -> str:
+    """Return the current time as an ISO string, cached per stamp window"""
+    global _last_stamp_s, _last_stamp_iso
+    t = time.time()
+    if t - _last_stamp_s >= STAMP_WINDOW_SEC:
+        _last_stamp_s = t
+        _last_stamp_iso = datetime.fromtimestamp(t).isoformat(timespec="milliseconds")
+    return _last_stamp_iso
+
+
+@dataclass(slots=True)
+class SensorState:
+    """Current sensor readings shared by the resources and tools"""
+
+    temperature: float = 20.0
+    humidity: float = 50.0
+    updated_at: str = ""
+    counter: int = 0
+
+
 # Shared state
-live_data = {
-    "temperature": 20.0,
-    "humidity": 50.0,
-    "updated_at": datetime.now().isoformat(),
-    "counter": 0,
-}
+live_data = SensorState(updated_at=_now_iso())
+# Source of live_data.counter; next() is atomic, unlike += across threads
+_counter = itertools.count(1)
+
+
+class SensorHistory:
+    """Ring buffer of recent readings, one array per field"""
+
+    def __init__(self, size: int = 4096):
+        self.size = size
+        self.temperature = np.empty(size, dtype=np.float64)
+        self.humidity = np.empty(size, dtype=np.float64)
+        self.timestamps = np.empty(size, dtype=np.float64)
+        self.count = 0  # Total readings recorded, including overwritten ones
+
+    def record(self, state: SensorState) -> None:
+        """Store the current readings, overwriting the oldest when full"""
+        idx = self.count % self.size
+        self.temperature[idx] = state.temperature
+        self.humidity[idx] = state.humidity
+        self.timestamps[idx] = time.time()
+        self.count += 1
+
+    def record_many(
+        self, times: np.ndarray, temperatures: np.ndarray, humidities: np.ndarray
+    ) -> None:
+        """Store a batch of readings, overwriting the oldest when full"""
+        n = len(times)
+        idx = (self.count + np.arange(max(0, n - self.size), n)) % self.size
+        self.temperature[idx] = temperatures[-self.size :]
+        self.humidity[idx] = humidities[-self.size :]
+        self.timestamps[idx] = times[-self.size :]
+        self.count += n
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the retained readings, oldest first"""
+        n = min(self.count, self.size)
+        # Rotate so the oldest reading (at the next write index) comes first
+        order = np.roll(np.arange(n), -(self.count % self.size))
+        return {
+            "temperature": self.temperature[order].tolist(),
+            "humidity": self.humidity[order].tolist(),
+            "timestamps": self.timestamps[order].tolist(),
+            "count": n,
+        }
+
+
+sensor_history = SensorHistory()
+sensor_history.record(live_data)
+
+# Serialized resource payloads, rebuilt whenever live_data is written
+_resource_cache: dict[str, str] = {}
+
+
+def _rebuild_resource_cache():
+    """Serialize every sensor resource from the current live_data"""
+    updated_at = live_data.updated_at
+    _resource_cache["sensor://temperature"] = _dumps(
+        {"value": live_data.temperature, "unit": "°C", "updated_at": updated_at}
+    )
+    _resource_cache["sensor://humidity"] = _dumps(
+        {"value": live_data.humidity, "unit": "%", "updated_at": updated_at}
+    )
+    _resource_cache["sensor://dashboard"] = _dumps(
+        {
+            "temperature": {"value": live_data.temperature, "unit": "°C"},
+            "humidity": {"value": live_data.humidity, "unit": "%"},
+            "updated_at": updated_at,
+            "counter": live_data.counter,
+        }
+    )
+
+
+_rebuild_resource_cache()
 
 # Track active subscriptions
 active_subscriptions = set()
 
+# One bit per sensor resource, so writers can check for subscribers without
+# hashing URIs; other URIs are only tracked in active_subscriptions
+TEMPERATURE_BIT = 1
+HUMIDITY_BIT = 2
+DASHBOARD_BIT = 4
+_SENSOR_BITS = {
+    "sensor://temperature": TEMPERATURE_BIT,
+    "sensor://humidity": HUMIDITY_BIT,
+    "sensor://dashboard": DASHBOARD_BIT,
+}
+_subscribed_sensors = 0
+
+# Changed resources waiting to be notified; flushed in batches so each
+# resource gets at most one notification per coalescing window
+COALESCE_WINDOW_MS = 20
+_pending_notifications: set[str] = set()
+_notifications_lock = threading.Lock()
+_flush_timer: asyncio.TimerHandle | None = None
+
+# Stop signals of running simulations, keyed by simulation ID
+_running_sims: dict[str, asyncio.Event] = {}
+# New simulations are refused while this many are running
+MAX_RUNNING_SIMULATIONS = 16
+_sim_ids = itertools.count(1)
+# Strong references so running simulation tasks are not garbage collected
+_background_tasks = set()
+
 
 @mcp.on_subscription_created
 def handle_subscription_created(params):
     """Handle a new subscription to a resource"""
     uri = params.get("uri")
-    sys.stderr.write(f"Subscription created for: {uri}\n")
+    logger.info("Subscription created for: %s", uri)
+    global _subscribed_sensors
     active_subscriptions.add(uri)
+    _subscribed_sensors |= _SENSOR_BITS.get(uri, 0)
 
 
 @mcp.on_subscription_canceled
 def handle_subscription_canceled(params):
     """Handle a canceled subscription"""
     uri = params.get("uri")
-    sys.stderr.write(f"Subscription canceled for: {uri}\n")
+    logger.info("Subscription canceled for: %s", uri)
+    global _subscribed_sensors
     active_subscriptions.discard(uri)
+    _subscribed_sensors &= ~_SENSOR_BITS.get(uri, 0)
 
 
 # Dynamic resources that change over time
 @mcp.resource("sensor://temperature")
 def get_temperature():
     """Get the current temperature"""
-    return json.dumps(
-        {
-            "value": live_data["temperature"],
-            "unit": "°C",
-            "updated_at": live_data["updated_at"],
-        }
-    )
+    return _resource_cache["sensor://temperature"]
 
 
 @mcp.resource("sensor://humidity")
 def get_humidity():
     """Get the current humidity"""
-    return json.dumps(
-        {
-            "value": live_data["humidity"],
-            "unit": "%",
-            "updated_at": live_data["updated_at"],
-        }
-    )
+    return _resource_cache["sensor://humidity"]
 
 
 @mcp.resource("sensor://dashboard")
 def get_dashboard():
     """Get all sensor data in one resource"""
-    return json.dumps(
-        {
-            "temperature": {"value": live_data["temperature"], "unit": "°C"},
-            "humidity": {"value": live_data["humidity"], "unit": "%"},
-            "updated_at": live_data["updated_at"],
-            "counter": live_data["counter"],
-        }
-    )
+    return _resource_cache["sensor://dashboard"]
+
+
+@mcp.resource("sensor://history")
+def get_history():
+    """Get the recent sensor readings, oldest first"""
+    return _dumps(sensor_history.to_dict())
 
 
 # Tools to interact with the resources
 @mcp.tool()
 def update_temperature(value: float) -> str:
     """Update the temperature sensor value"""
-    old_value = live_data["temperature"]
-    live_data["temperature"] = value
-    live_data["updated_at"] = datetime.now().isoformat()
-    live_data["counter"] += 1
+    old_value = live_data.temperature
+    live_data.temperature = value
+    live_data.updated_at = _now_iso()
+    live_data.counter = next(_counter)
+    sensor_history.record(live_data)
+    _rebuild_resource_cache()
 
     # Send notifications for all related resources
-    notify_resource_change("sensor://temperature")
-    notify_resource_change("sensor://dashboard")
+    notify_sensor_change(TEMPERATURE_BIT | DASHBOARD_BIT)
+    _schedule_flush()
 
     return f"Temperature updated from {old_value}°C to {value}°C"
 
@@ -100,14 +241,16 @@ def update_temperature(value: float) -> str:
 @mcp.tool()
 def update_humidity(value: float) -> str:
     """Update the humidity sensor value"""
-    old_value = live_data["humidity"]
-    live_data["humidity"] = value
-    live_data["updated_at"] = datetime.now().isoformat()
-    live_data["counter"] += 1
+    old_value = live_data.humidity
+    live_data.humidity = value
+    live_data.updated_at = _now_iso()
+    live_data.counter = next(_counter)
+    sensor_history.record(live_data)
+    _rebuild_resource_cache()
 
     # Send notifications for all related resources
-    notify_resource_change("sensor://humidity")
-    notify_resource_change("sensor://dashboard")
+    notify_sensor_change(HUMIDITY_BIT | DASHBOARD_BIT)
+    _schedule_flush()
 
     return f"Humidity updated from {old_value}% to {value}%"
 
@@ -119,61 +262,158 @@ def list_active_subscriptions() -> dict:
 
 
 @mcp.tool()
-def simulate_continuous_updates(
+async def simulate_continuous_updates(
     duration_sec: int = 30, interval_sec: float = 1.0
 ) -> str:
     """
     Simulate continuous updates to sensors for a specified duration.
     This demonstrates how notifications work with fast-changing data.
     """
+    if len(_running_sims) >= MAX_RUNNING_SIMULATIONS:
+        return f"Too many simulations running (limit {MAX_RUNNING_SIMULATIONS}); stop one with stop_simulation first"
 
-    def run_simulation():
-        start_time = time.time()
-        update_count = 0
+    sim_id = f"sim_{next(_sim_ids)}"
+    stop_event = asyncio.Event()
+    _running_sims[sim_id] = stop_event
+
+    # Run the simulation as a background task on the server's event loop
+    task = asyncio.create_task(
+        _run_simulation(sim_id, duration_sec, interval_sec, stop_event)
+    )
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
 
+    return f"Started sensor simulation {sim_id} for {duration_sec} seconds with updates every {interval_sec} seconds"
+
+
+@mcp.tool()
+async def stop_simulation(sim_id: str) -> str:
+    """Stop a running sensor simulation before its duration has elapsed"""
+    stop_event = _running_sims.get(sim_id)
+    if stop_event is None:
+        return f"No running simulation with ID {sim_id}"
+
+    stop_event.set()
+    return f"Stopping simulation {sim_id}"
+
+
+def _advance(t_start: float, dt: float, n: int):
+    """Compute n simulated readings spaced dt seconds apart from t_start"""
+    times = t_start + dt * np.arange(n)
+    temperatures = 20 + 5 * (0.5 - (times % 10) / 10)  # Oscillation
+    humidities = 50 + 10 * (0.5 - (times % 15) / 15)  # Different oscillation
+    return times, temperatures, humidities
+
+
+async def _run_simulation(
+    sim_id: str, duration_sec: int, interval_sec: float, stop_event: asyncio.Event
+):
+    """Update the sensors every interval until the duration passes or it is stopped"""
+    start_time = time.time()
+    update_count = 0
+    # Ticks shorter than the coalescing window are generated in batches, so a
+    # single cache rebuild and notification flush covers the whole batch
+    batch_size = 1
+    if interval_sec > 0:
+        batch_size = max(1, math.ceil(COALESCE_WINDOW_MS / 1000 / interval_sec))
+
+    try:
         while time.time() - start_time < duration_sec:
-            # Generate simulated sensor readings
-            live_data["temperature"] = 20 + 5 * (
-                0.5 - (time.time() % 10) / 10
-            )  # Oscillation
-            live_data["humidity"] = 50 + 10 * (
-                0.5 - (time.time() % 15) / 15
-            )  # Different oscillation
-            live_data["updated_at"] = datetime.now().isoformat()
-            live_data["counter"] += 1
-            update_count += 1
+            # Generate simulated sensor readings for the batch
+            times, temperatures, humidities = _advance(
+                time.time(), interval_sec, batch_size
+            )
+            sensor_history.record_many(times, temperatures, humidities)
+            live_data.temperature = float(temperatures[-1])
+            live_data.humidity = float(humidities[-1])
+            live_data.updated_at = _now_iso()
+            live_data.counter = next(_counter)
+            previous_count = update_count
+            update_count += batch_size
+            _rebuild_resource_cache()
 
             # Send notifications for all related resources
-            notify_resource_change("sensor://temperature")
-            notify_resource_change("sensor://humidity")
-            notify_resource_change("sensor://dashboard")
+            notify_sensor_change(TEMPERATURE_BIT | HUMIDITY_BIT | DASHBOARD_BIT)
+            _flush_notifications()
 
             # Log update (visible in the server's stderr)
-            if update_count % 5 == 0:  # Log every 5 updates to reduce noise
-                sys.stderr.write(
-                    f"Update #{update_count}: T={live_data['temperature']:.2f}°C, H={live_data['humidity']:.2f}%\n"
+            if update_count // 5 > previous_count // 5:  # Log every 5 updates
+                logger.debug(
+                    "Update #%d: T=%.2f°C, H=%.2f%%",
+                    update_count,
+                    live_data.temperature,
+                    live_data.humidity,
                 )
 
-            time.sleep(interval_sec)
-
-        sys.stderr.write(
-            f"Simulation complete: {update_count} updates sent over {duration_sec} seconds\n"
+            # Wait for the next tick, waking early if a stop is requested
+            try:
+                await asyncio.wait_for(
+                    stop_event.wait(), timeout=interval_sec * batch_size
+                )
+                break
+            except TimeoutError:
+                pass
+
+        logger.info(
+            "Simulation %s complete: %d updates sent over %.1f seconds",
+            sim_id,
+            update_count,
+            time.time() - start_time,
         )
-
-    # Run the simulation in a background thread
-    thread = threading.Thread(target=run_simulation)
-    thread.daemon = True
-    thread.start()
-
-    return f"Started sensor simulation for {duration_sec} seconds with updates every {interval_sec} seconds"
-
-
-def notify_resource_change(uri):
-    """Send a notification if the resource is being subscribed to"""
-    if uri in active_subscriptions:
-        sys.stderr.write(
-            f"Sending notification for {uri} (counter: {live_data['counter']})\n"
+    finally:
+        _running_sims.pop(sim_id, None)
+
+
+def notify_sensor_change(bits: int):
+    """Queue notifications for the changed sensor resources that have subscribers"""
+    changed = bits & _subscribed_sensors
+    if not changed:
+        return
+
+    with _notifications_lock:
+        for uri, bit in _SENSOR_BITS.items():
+            if changed & bit:
+                _pending_notifications.add(uri)
+
+
+def _schedule_flush():
+    """Flush pending notifications once the coalescing window has passed"""
+    global _flush_timer
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Not on the server's event loop, so there is no loop to defer to
+        _flush_notifications()
+        return
+
+    with _notifications_lock:
+        if _flush_timer is None:
+            _flush_timer = loop.call_later(
+                COALESCE_WINDOW_MS / 1000, _flush_notifications
+            )
+
+
+def _flush_notifications():
+    """Send one notification per changed resource that is being subscribed to"""
+    global _flush_timer
+    with _notifications_lock:
+        uris = [uri for uri in _pending_notifications if uri in active_subscriptions]
+        _pending_notifications.clear()
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+
+    if not uris:
+        return
+
+    if logger.isEnabledFor(logging.DEBUG):
+        counter = live_data.counter
+        logger.debug(
+            "\n".join(
+                f"Sending notification for {uri} (counter: {counter})" for uri in uris
+            )
         )
+    for uri in uris:
         mcp.notify_resource_changed(uri)
 
 
@@ -183,10 +423,12 @@ sys.stderr.write("This example demonstrates MCP's resource notification system:\
 sys.stderr.write(
     "1. Subscribe to resources: sensor://temperature, sensor://humidity, or sensor://dashboard\n"
 )
+sys.stderr.write("   (sensor://history returns the recent readings)\n")
 sys.stderr.write(
     "2. Use update_temperature/update_humidity tools to trigger notifications\n"
 )
 sys.stderr.write("3. Use simulate_continuous_updates to see real-time notifications\n")
+sys.stderr.write("   (stop_simulation ends a running simulation early)\n")
 sys.stderr.write(
     "4. Use list_active_subscriptions to see what resources are being watched\n\n"
 )
@@ -1,21 +1,53 @@
+import asyncio
 import getpass
 import json
 
 # Workaround for os.getlogin issues in some environments
 import os
 import sys
+import threading
+import time
 import uuid
+from collections import deque
 from datetime import datetime
 from typing import Any, Dict, List
 
 from mcp.server.fastmcp import FastMCP
 from mcp.shared.types import SamplingMessage, TextContent
 
+# Prefer orjson for serializing resources when it is installed
+try:
+    import orjson
+
+    def _dumps(obj: Any, indent: bool = False) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+except ImportError:
+
+    def _dumps(obj: Any, indent: bool = False) -> str:
+        return json.dumps(obj, indent=2 if indent else None)
+
+
 os.getlogin = getpass.getuser
 
 # Create an MCP server
 mcp = FastMCP("SamplingDemo")
 
+# Timestamps formatted within this window reuse the cached ISO string
+STAMP_WINDOW_SEC = 0.05
+_last_stamp_s = 0.0
+_last_stamp_iso = ""
+
+
+def _now_iso() -> str:
+    """Return the current time as an ISO string, cached per stamp window"""
+    global _last_stamp_s, _last_stamp_iso
+    t = time.time()
+    if t - _last_stamp_s >= STAMP_WINDOW_SEC:
+        _last_stamp_s = t
+        _last_stamp_iso = datetime.fromtimestamp(t).isoformat(timespec="milliseconds")
+    return _last_stamp_iso
+
+
 # Sampling capability requires explicit configuration
 mcp.server_capabilities["features"]["sampling"] = {
     "supported": True,
@@ -24,8 +56,38 @@ mcp.server_capabilities["features"]["sampling"] = {
     "supportsBatching": True,
 }
 
-# Store a history of successful sampling operations
-sampling_history = []
+# Store a history of successful sampling operations, keeping the latest ones
+MAX_HISTORY = 1000
+sampling_history: deque[Dict[str, Any]] = deque(maxlen=MAX_HISTORY)
+_history_lock = threading.Lock()
+
+# System prompts that never change, built once and shared by every request
+CLASSIFY_SYSTEM = SamplingMessage(
+    role="system",
+    content=[
+        TextContent(
+            text="You are a text classifier. You will be given a text and a list of categories. "
+            "Your task is to classify the text into exactly one of the provided categories. "
+            "Respond with just the category name, nothing else."
+        )
+    ],
+)
+TOPIC_SYSTEM = SamplingMessage(
+    role="system",
+    content=[
+        TextContent(
+            text="Extract the 3 main topics from the document as a comma-separated list."
+        )
+    ],
+)
+SENTIMENT_SYSTEM = SamplingMessage(
+    role="system",
+    content=[
+        TextContent(
+            text="What is the overall sentiment of this document? Respond with one word: Positive, Neutral, or Negative."
+        )
+    ],
+)
 
 
 @mcp.on_initialize
@@ -46,6 +108,11 @@ def handle_initialize(params):
     return {"capabilities": mcp.server_capabilities}
 
 
+async def _sample_async(messages: List[SamplingMessage]):
+    """Run a blocking sampling request without blocking the event loop"""
+    return await asyncio.to_thread(mcp.sample, messages)
+
+
 # A tool that uses sampling to get LLM input
 @mcp.tool()
 def classify_text(text: str, categories: List[str]) -> Dict[str, Any]:
@@ -60,16 +127,7 @@ def classify_text(text: str, categories: List[str]) -> Dict[str, Any]:
 
     # Create a sampling request to ask the LLM to classify the text
     prompt_messages = [
-        SamplingMessage(
-            role="system",
-            content=[
-                TextContent(
-                    text="You are a text classifier. You will be given a text and a list of categories. "
-                    "Your task is to classify the text into exactly one of the provided categories. "
-                    "Respond with just the category name, nothing else."
-                )
-            ],
-        ),
+        CLASSIFY_SYSTEM,
         SamplingMessage(
             role="user",
             content=[
@@ -93,12 +151,13 @@ def classify_text(text: str, categories: List[str]) -> Dict[str, Any]:
         # Store in history
         record = {
             "id": str(uuid.uuid4()),
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": _now_iso(),
             "text": text,
             "categories": categories,
             "classification": classification,
         }
-        sampling_history.append(record)
+        with _history_lock:
+            sampling_history.append(record)
 
         return {
             "classification": classification,
@@ -112,7 +171,7 @@ def classify_text(text: str, categories: List[str]) -> Dict[str, Any]:
 
 
 @mcp.tool()
-def multi_step_analysis(document: str) -> Dict[str, Any]:
+async def multi_step_analysis(document: str) -> Dict[str, Any]:
     """
     Perform multi-step analysis of a document using nested sampling
 
@@ -124,29 +183,23 @@ def multi_step_analysis(document: str) -> Dict[str, Any]:
 
     results = {}
 
+    # Every request is about the same document, so they share one user message
+    user_doc = SamplingMessage(role="user", content=[TextContent(text=document)])
+
+    # Step 3 does not depend on the topics, so the sentiment request is
+    # started first and runs while the topics are extracted and summarized
+    sentiment_task = asyncio.create_task(_sample_async([SENTIMENT_SYSTEM, user_doc]))
+
     # Step 1: Extract key topics
     sys.stderr.write("Step 1: Extracting key topics...\n")
-    topic_messages = [
-        SamplingMessage(
-            role="system",
-            content=[
-                TextContent(
-                    text="Extract the 3 main topics from the document as a comma-separated list."
-                )
-            ],
-        ),
-        SamplingMessage(role="user", content=[TextContent(text=document)]),
-    ]
-
     try:
-        topic_result = mcp.sample(topic_messages)
+        topic_result = await _sample_async([TOPIC_SYSTEM, user_doc])
         topics = [t.strip() for t in topic_result.content[0].text.split(",")]
         results["topics"] = topics
         sys.stderr.write(f"Topics: {topics}\n")
 
-        # Step 2: For each topic, generate a summary using nested sampling
-        results["topic_summaries"] = {}
-
+        # Step 2: Generate a summary for every topic concurrently
+        summary_requests = []
         for topic in topics:
             sys.stderr.write(f"Step 2: Generating summary for topic '{topic}'...\n")
 
@@ -159,42 +212,43 @@ def multi_step_analysis(document: str) -> Dict[str, Any]:
                         )
                     ],
                 ),
-                SamplingMessage(role="user", content=[TextContent(text=document)]),
+                user_doc,
             ]
+            summary_requests.append(_sample_async(summary_messages))
+
+        summary_results = await asyncio.gather(
+            *summary_requests, return_exceptions=True
+        )
+        for summary_result in summary_results:
+            if isinstance(summary_result, Exception):
+                raise summary_result
 
-            summary_result = mcp.sample(summary_messages)
-            results["topic_summaries"][topic] = summary_result.content[0].text.strip()
+        results["topic_summaries"] = {
+            topic: summary_result.content[0].text.strip()
+            for topic, summary_result in zip(topics, summary_results)
+        }
 
         # Step 3: Overall sentiment analysis
         sys.stderr.write("Step 3: Analyzing sentiment...\n")
-        sentiment_messages = [
-            SamplingMessage(
-                role="system",
-                content=[
-                    TextContent(
-                        text="What is the overall sentiment of this document? Respond with one word: Positive, Neutral, or Negative."
-                    )
-                ],
-            ),
-            SamplingMessage(role="user", content=[TextContent(text=document)]),
-        ]
-
-        sentiment_result = mcp.sample(sentiment_messages)
+        sentiment_result = await sentiment_task
         results["sentiment"] = sentiment_result.content[0].text.strip()
         sys.stderr.write(f"Sentiment: {results['sentiment']}\n")
 
         # Record the analysis
         record = {
             "id": str(uuid.uuid4()),
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": _now_iso(),
             "document_length": len(document),
             "results": results,
         }
-        sampling_history.append(record)
+        with _history_lock:
+            sampling_history.append(record)
 
         return results
 
     except Exception as e:
+        # Don't leave the concurrent sentiment request behind
+        sentiment_task.cancel()
         sys.stderr.write(f"⚠️ Analysis failed: {str(e)}\n")
         return {"error": "Analysis failed", "message": str(e)}
 
@@ -202,13 +256,14 @@ def multi_step_analysis(document: str) -> Dict[str, Any]:
 @mcp.tool()
 def get_sampling_history() -> List[Dict[str, Any]]:
     """Get the history of sampling operations"""
-    return sampling_history
+    with _history_lock:
+        return list(sampling_history)
 
 
 @mcp.resource("sampling://capabilities")
 def get_sampling_capabilities() -> str:
     """Get detailed information about the sampling capabilities"""
-    return json.dumps(
+    return _dumps(
         {
             "server_capabilities": mcp.server_capabilities["features"]["sampling"],
             "description": "This server demonstrates bidirectional sampling, where an MCP server can request the client to perform LLM operations",
@@ -1,5 +1,7 @@
+import asyncio
 import getpass
 import json
+import logging
 
 # Workaround for os.getlogin issues in some environments
 import os
@@ -8,18 +10,68 @@ import sys
 import threading
 import time
 import uuid
+from collections import OrderedDict
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Coroutine, Dict
 
 from mcp.server.fastmcp import FastMCP
 
+# Prefer orjson for serializing resources when it is installed
+try:
+    import orjson
+
+    def _dumps(obj: Any, indent: bool = False) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+except ImportError:
+
+    def _dumps(obj: Any, indent: bool = False) -> str:
+        return json.dumps(obj, indent=2 if indent else None)
+
+
 os.getlogin = getpass.getuser
 
+# Per-step traces are DEBUG; set MCP_VERBOSE to see them
+logging.basicConfig(
+    level=logging.DEBUG if os.environ.get("MCP_VERBOSE") else logging.INFO,
+    format="%(message)s",
+    stream=sys.stderr,
+)
+logger = logging.getLogger("progress-tracking")
+
 # Create an MCP server
 mcp = FastMCP("ProgressTrackingDemo")
 
-# Simulate a database of tasks
-tasks_db = {}
+# Timestamps formatted within this window reuse the cached ISO string
+STAMP_WINDOW_SEC = 0.05
+_last_stamp_s = 0.0
+_last_stamp_iso = ""
+
+
+def _now_iso() -> str:
+    """Return the current time as an ISO string, cached per stamp window"""
+    global _last_stamp_s, _last_stamp_iso
+    t = time.time()
+    if t - _last_stamp_s >= STAMP_WINDOW_SEC:
+        _last_stamp_s = t
+        _last_stamp_iso = datetime.fromtimestamp(t).isoformat(timespec="milliseconds")
+    return _last_stamp_iso
+
+
+# Simulated work sleeps at least this long; shorter steps are batched
+MIN_SLEEP_SEC = 0.01
+
+# At most this many tasks run at once; later ones stay pending until a slot frees
+MAX_RUNNING_TASKS = 16
+_task_slots = asyncio.Semaphore(MAX_RUNNING_TASKS)
+
+# Simulate a database of tasks; the oldest tasks are dropped past the cap
+MAX_TASKS = 1000
+tasks_db: OrderedDict[str, "Task"] = OrderedDict()
+
+# Number of tracked tasks in each status, maintained on every transition
+_status_counts = {"pending": 0, "running": 0, "completed": 0, "failed": 0}
+# Guards tasks_db and _status_counts; readers only hold it to take a snapshot
+_tasks_lock = threading.Lock()
 
 
 class Task:
@@ -33,31 +85,66 @@ class Task:
         self.status = "pending"  # pending, running, completed, failed
         self.result = None
         self.error = None
-        self.created_at = datetime.now().isoformat()
+        self.created_at = _now_iso()
         self.completed_at = None
         self.progress_token = None
+        self.runner = None  # asyncio task executing this task
 
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert task to dictionary for serialization"""
-        return {
+        # Fields that never change after creation
+        self._static_dict = {
             "id": self.id,
             "name": self.name,
-            "status": self.status,
-            "current_step": self.current_step,
             "total_steps": self.total_steps,
-            "progress": round(self.current_step / self.total_steps * 100)
-            if self.total_steps > 0
-            else 0,
             "created_at": self.created_at,
+        }
+
+    @property
+    def current_step(self) -> int:
+        """Number of steps completed so far"""
+        return self._current_step
+
+    @current_step.setter
+    def current_step(self, value: int) -> None:
+        # Keep the progress percentage in step so reads don't recompute it
+        self._current_step = value
+        self._progress_pct = (
+            round(value / self.total_steps * 100) if self.total_steps > 0 else 0
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert task to dictionary for serialization"""
+        return {
+            **self._static_dict,
+            "status": self.status,
+            "current_step": self._current_step,
+            "progress": self._progress_pct,
             "completed_at": self.completed_at,
             "result": self.result,
             "error": self.error,
         }
 
+    def set_status(self, status: str) -> None:
+        """Move the task to a new status, keeping the status counts in sync"""
+        with _tasks_lock:
+            if self.id in tasks_db:
+                _status_counts[self.status] -= 1
+                _status_counts[status] += 1
+            self.status = status
+
+
+def _register_task(task: Task) -> None:
+    """Add a task to the database, evicting the oldest tasks past MAX_TASKS"""
+    with _tasks_lock:
+        tasks_db[task.id] = task
+        _status_counts[task.status] += 1
+        while len(tasks_db) > MAX_TASKS:
+            _, evicted = tasks_db.popitem(last=False)
+            _status_counts[evicted.status] -= 1
+
 
 # Tools for creating and managing long-running tasks
 @mcp.tool()
-def start_data_processing(
+async def start_data_processing(
     dataset_size: int, processing_time: float = 10.0
 ) -> Dict[str, Any]:
     """
@@ -72,20 +159,16 @@ def start_data_processing(
     """
     # Create a new task
     task = Task(f"Data Processing ({dataset_size} items)", dataset_size)
-    tasks_db[task.id] = task
+    _register_task(task)
 
-    # Start processing in a background thread
-    thread = threading.Thread(
-        target=process_data_with_progress, args=(task, processing_time)
-    )
-    thread.daemon = True
-    thread.start()
+    # Start processing as a background task on the server's event loop
+    _start_runner(task, process_data_with_progress(task, processing_time))
 
     return task.to_dict()
 
 
 @mcp.tool()
-def start_complex_analysis(
+async def start_complex_analysis(
     complexity: int = 5, failure_chance: float = 0.0
 ) -> Dict[str, Any]:
     """
@@ -103,14 +186,10 @@ def start_complex_analysis(
 
     # Create a new task
     task = Task(f"Complex Analysis (Complexity {complexity})", total_steps)
-    tasks_db[task.id] = task
+    _register_task(task)
 
-    # Start analysis in a background thread
-    thread = threading.Thread(
-        target=run_complex_analysis, args=(task, complexity, failure_chance)
-    )
-    thread.daemon = True
-    thread.start()
+    # Start analysis as a background task on the server's event loop
+    _start_runner(task, run_complex_analysis(task, complexity, failure_chance))
 
     return task.to_dict()
 
@@ -126,10 +205,35 @@ def get_task_status(task_id: str) -> Dict[str, Any]:
     Returns:
         Current task status and progress information
     """
-    if task_id not in tasks_db:
+    task = tasks_db.get(task_id)
+    if task is None:
         return {"error": "Task not found"}
 
-    return tasks_db[task_id].to_dict()
+    return task.to_dict()
+
+
+@mcp.tool()
+async def cancel_task(task_id: str) -> Dict[str, Any]:
+    """
+    Cancel a running task
+
+    Args:
+        task_id: The ID of the task to cancel
+
+    Returns:
+        Task status after the cancellation request
+    """
+    task = tasks_db.get(task_id)
+    if task is None:
+        return {"error": "Task not found"}
+
+    if task.runner is None or task.runner.done():
+        return {"error": f"Task is not running (status: {task.status})"}
+
+    task.runner.cancel()
+    # Let the task observe the cancellation and record its final state
+    await asyncio.gather(task.runner, return_exceptions=True)
+    return task.to_dict()
 
 
 @mcp.tool()
@@ -140,69 +244,109 @@ def list_all_tasks() -> Dict[str, Any]:
     Returns:
         Dictionary of all tasks with their current status
     """
-    return {"tasks": [task.to_dict() for task in tasks_db.values()]}
+    with _tasks_lock:
+        tasks = list(tasks_db.values())
+
+    return {"tasks": [task.to_dict() for task in tasks]}
 
 
 @mcp.resource("tasks://{task_id}")
 def get_task_resource(task_id: str) -> str:
     """Get detailed information about a specific task"""
-    if task_id not in tasks_db:
-        return json.dumps({"error": "Task not found"})
+    task = tasks_db.get(task_id)
+    if task is None:
+        return _dumps({"error": "Task not found"})
 
-    return json.dumps(tasks_db[task_id].to_dict(), indent=2)
+    return _dumps(task.to_dict(), indent=True)
 
 
 @mcp.resource("tasks://all")
 def get_all_tasks_resource() -> str:
     """Get information about all tasks"""
-    return json.dumps(
-        {
-            "tasks": [task.to_dict() for task in tasks_db.values()],
-            "count": len(tasks_db),
-            "pending": sum(1 for task in tasks_db.values() if task.status == "pending"),
-            "running": sum(1 for task in tasks_db.values() if task.status == "running"),
-            "completed": sum(
-                1 for task in tasks_db.values() if task.status == "completed"
-            ),
-            "failed": sum(1 for task in tasks_db.values() if task.status == "failed"),
-        },
-        indent=2,
+    with _tasks_lock:
+        tasks = list(tasks_db.values())
+        counts = dict(_status_counts)
+
+    # Serialize the tasks one at a time so only one task dict is alive at
+    # once, then splice the array in front of the summary fields
+    summary = _dumps({"count": len(tasks), **counts})
+    return (
+        '{"tasks":['
+        + ",".join(_dumps(task.to_dict()) for task in tasks)
+        + "],"
+        + summary[1:]
     )
 
 
 # Progress tracking implementation functions
-def process_data_with_progress(task: Task, processing_time: float):
+def _start_runner(task: Task, work: Coroutine[Any, Any, None]) -> None:
+    """Schedule the task's work on the server's event loop"""
+    task.runner = asyncio.create_task(_run_with_slot(work))
+
+    def _on_done(_runner: asyncio.Task) -> None:
+        # Cancelled before the work started (possibly before the runner even
+        # ran), so the work coroutine never got a chance to record it
+        if task.status == "pending":
+            work.close()
+            _fail_task(task, "Task cancelled", "Cancelled")
+
+    task.runner.add_done_callback(_on_done)
+
+
+async def _run_with_slot(work: Coroutine[Any, Any, None]) -> None:
+    """Run the work once one of the running-task slots is free"""
+    async with _task_slots:
+        await work
+
+
+async def process_data_with_progress(task: Task, processing_time: float):
     """Simulate data processing with progress updates"""
     try:
         # Start the task with progress tracking
-        task.status = "running"
-        progress_token = start_progress_tracking(task.id)
+        task.set_status("running")
+        progress_token = f"task_{task.id}"
+        _start_progress(
+            token=progress_token,
+            title=f"Task {task.id[:8]}",
+            message="Initializing...",
+        )
         task.progress_token = progress_token
 
-        # Simulate processing steps
+        # Simulate processing steps, batching tiny steps so each sleep lasts
+        # at least MIN_SLEEP_SEC and reports progress once
         step_time = processing_time / task.total_steps
-
-        for i in range(task.total_steps):
+        batch_size = task.total_steps
+        if step_time > 0:
+            batch_size = max(1, int(MIN_SLEEP_SEC / step_time))
+        log_every = max(1, task.total_steps // 10)
+        # Only the item number changes from step to step
+        message_template = f"Processing item %d of {task.total_steps}"
+
+        for i in range(0, task.total_steps, batch_size):
             # Update progress
-            task.current_step = i + 1
-            update_progress(
+            task.current_step = min(i + batch_size, task.total_steps)
+            _update_progress(
                 progress_token,
                 task.current_step / task.total_steps,
-                f"Processing item {task.current_step} of {task.total_steps}",
+                message_template % task.current_step,
             )
 
             # Log progress
-            if (i + 1) % max(1, task.total_steps // 10) == 0:  # Log every ~10% progress
-                sys.stderr.write(
-                    f"Task {task.id}: {task.current_step}/{task.total_steps} ({task.current_step / task.total_steps * 100:.1f}%)\n"
+            if task.current_step // log_every > i // log_every:  # Every ~10%
+                logger.debug(
+                    "Task %s: %d/%d (%.1f%%)",
+                    task.id,
+                    task.current_step,
+                    task.total_steps,
+                    task.current_step / task.total_steps * 100,
                 )
 
             # Simulate work
-            time.sleep(step_time)
+            await asyncio.sleep(step_time * (task.current_step - i))
 
         # Complete the task
-        task.status = "completed"
-        task.completed_at = datetime.now().isoformat()
+        task.set_status("completed")
+        task.completed_at = _now_iso()
         task.result = {
             "processed_items": task.total_steps,
             "success_rate": random.uniform(0.95, 1.0),
@@ -210,32 +354,30 @@ def process_data_with_progress(task: Task, processing_time: float):
         }
 
         # Final progress update
-        update_progress(
+        _update_progress(
             progress_token, 1.0, f"Successfully processed {task.total_steps} items"
         )
-        end_progress_tracking(progress_token, success=True)
+        _end_progress(progress_token, success=True)
 
+    except asyncio.CancelledError:
+        _fail_task(task, "Task cancelled", "Cancelled")
+        raise
     except Exception as e:
         # Handle failures
-        task.status = "failed"
-        task.completed_at = datetime.now().isoformat()
-        task.error = str(e)
-
-        if task.progress_token:
-            update_progress(
-                task.progress_token,
-                task.current_step / task.total_steps,
-                f"Failed: {str(e)}",
-            )
-            end_progress_tracking(task.progress_token, success=False)
+        _fail_task(task, str(e), f"Failed: {str(e)}")
 
 
-def run_complex_analysis(task: Task, complexity: int, failure_chance: float):
+async def run_complex_analysis(task: Task, complexity: int, failure_chance: float):
     """Simulate a complex multi-phase analysis with progress tracking"""
     try:
         # Start the task with progress tracking
-        task.status = "running"
-        progress_token = start_progress_tracking(task.id)
+        task.set_status("running")
+        progress_token = f"task_{task.id}"
+        _start_progress(
+            token=progress_token,
+            title=f"Task {task.id[:8]}",
+            message="Initializing...",
+        )
         task.progress_token = progress_token
 
         steps_completed = 0
@@ -247,14 +389,15 @@ def run_complex_analysis(task: Task, complexity: int, failure_chance: float):
 
             # Phase description
             phase_name = f"Phase {phase}"
-            update_progress(
+            _update_progress(
                 progress_token,
                 steps_completed / task.total_steps,
                 f"Starting {phase_name} ({phase_steps} steps)",
             )
-            sys.stderr.write(f"Task {task.id}: Starting {phase_name}\n")
+            logger.info("Task %s: Starting %s", task.id, phase_name)
 
-            # Simulate phase steps
+            # Simulate phase steps; only the step number changes within a phase
+            message_template = f"{phase_name}: Step %d/{phase_steps}"
             for step in range(1, phase_steps + 1):
                 # Check for random failure
                 if random.random() < failure_chance:
@@ -263,14 +406,14 @@ def run_complex_analysis(task: Task, complexity: int, failure_chance: float):
                 # Update progress
                 steps_completed += 1
                 task.current_step = steps_completed
-                update_progress(
+                _update_progress(
                     progress_token,
                     steps_completed / task.total_steps,
-                    f"{phase_name}: Step {step}/{phase_steps}",
+                    message_template % step,
                 )
 
                 # Simulate work
-                time.sleep(0.5)  # Half-second per step
+                await asyncio.sleep(0.5)  # Half-second per step
 
             # Record phase completion
             phase_results[phase_name] = {
@@ -278,13 +421,17 @@ def run_complex_analysis(task: Task, complexity: int, failure_chance: float):
                 "quality_score": random.uniform(0.7, 1.0),
             }
 
-            sys.stderr.write(
-                f"Task {task.id}: Completed {phase_name}, total progress: {steps_completed}/{task.total_steps}\n"
+            logger.info(
+                "Task %s: Completed %s, total progress: %d/%d",
+                task.id,
+                phase_name,
+                steps_completed,
+                task.total_steps,
             )
 
         # Complete the task
-        task.status = "completed"
-        task.completed_at = datetime.now().isoformat()
+        task.set_status("completed")
+        task.completed_at = _now_iso()
         task.result = {
             "phases_completed": complexity,
             "total_steps": task.total_steps,
@@ -294,49 +441,78 @@ def run_complex_analysis(task: Task, complexity: int, failure_chance: float):
         }
 
         # Final progress update
-        update_progress(
+        _update_progress(
             progress_token,
             1.0,
             f"Analysis completed successfully with {complexity} phases",
         )
-        end_progress_tracking(progress_token, success=True)
+        _end_progress(progress_token, success=True)
 
+    except asyncio.CancelledError:
+        _fail_task(task, "Task cancelled", "Analysis cancelled")
+        raise
     except Exception as e:
         # Handle failures
-        task.status = "failed"
-        task.completed_at = datetime.now().isoformat()
-        task.error = str(e)
-
-        if task.progress_token:
-            update_progress(
-                task.progress_token,
-                task.current_step / task.total_steps,
-                f"Analysis failed: {str(e)}",
-            )
-            end_progress_tracking(task.progress_token, success=False)
+        _fail_task(task, str(e), f"Analysis failed: {str(e)}")
 
 
-# Progress tracking API wrappers
-def start_progress_tracking(task_id: str) -> str:
-    """Start progress tracking for a task and return the progress token"""
-    progress_token = f"task_{task_id}"
+def _fail_task(task: Task, error: str, message: str) -> None:
+    """Mark a task as failed and close its progress tracking"""
+    task.set_status("failed")
+    task.completed_at = _now_iso()
+    task.error = error
 
-    # Initialize progress tracking with the MCP server
-    mcp.start_progress_tracking(
-        token=progress_token, title=f"Task {task_id[:8]}", message="Initializing..."
-    )
+    if task.progress_token:
+        _update_progress(
+            task.progress_token,
+            task.current_step / task.total_steps,
+            message,
+            force=True,
+        )
+        _end_progress(task.progress_token, success=False)
+
+
+class _ProgressCoalescer:
+    """Drops progress updates that arrive too close to the last forwarded one"""
+
+    def __init__(self, min_delta: float = 0.01, min_interval: float = 0.05):
+        self.min_delta = min_delta
+        self.min_interval = min_interval
+        # Last forwarded (progress, monotonic time) for each token
+        self._last: Dict[str, tuple[float, float]] = {}
+
+    def update(
+        self, token: str, progress: float, message: str, force: bool = False
+    ) -> None:
+        """Forward the update if it moved far enough or enough time has passed"""
+        now = time.monotonic()
+        last = self._last.get(token)
+        if (
+            force
+            or last is None
+            or progress >= 1.0
+            or progress - last[0] >= self.min_delta
+            or now - last[1] >= self.min_interval
+        ):
+            self._last[token] = (progress, now)
+            mcp.update_progress_tracking(
+                token=token, progress=progress, message=message
+            )
 
-    return progress_token
+    def end(self, token: str, success: bool) -> None:
+        """End progress tracking for a token and drop its state"""
+        self._last.pop(token, None)
+        mcp.end_progress_tracking(token=token, success=success)
 
 
-def update_progress(token: str, progress: float, message: str) -> None:
-    """Update progress for a task"""
-    mcp.update_progress_tracking(token=token, progress=progress, message=message)
+def _start_progress(token: str, title: str, message: str) -> None:
+    """Start progress tracking for a token"""
+    mcp.start_progress_tracking(token=token, title=title, message=message)
 
 
-def end_progress_tracking(token: str, success: bool) -> None:
-    """End progress tracking for a task"""
-    mcp.end_progress_tracking(token=token, success=success)
+_progress_coalescer = _ProgressCoalescer()
+_update_progress = _progress_coalescer.update
+_end_progress = _progress_coalescer.end
 
 
 # Explain what this demo does when run with MCP CLI
@@ -351,6 +527,7 @@ sys.stderr.write(
     "2. Use start_complex_analysis to run a multi-phase task (try setting failure_chance)\n"
 )
 sys.stderr.write("3. Watch progress updates appear in the client\n")
+sys.stderr.write("   (cancel_task stops a running task)\n")
 sys.stderr.write(
     "4. Use get_task_status or check the tasks:// resources to monitor tasks\n\n"
 )
@@ -1,48 +1,183 @@
-import getpass
-import json
-
 # Workaround for os.getlogin issues in some environments
 import os
+import secrets
 import sys
-import uuid
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Dict
+from enum import IntEnum
+from typing import Any, Dict, List
 
 from mcp.server.fastmcp import FastMCP
 
-os.getlogin = getpass.getuser
+# Prefer orjson for serializing resources when it is installed
+try:
+    import orjson
+
+    def _dumps(obj: Any, indent: bool = False) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+except ImportError:
+    import json
+
+    def _dumps(obj: Any, indent: bool = False) -> str:
+        return json.dumps(obj, indent=2 if indent else None)
+
+
+def _getlogin() -> str:
+    """Stand-in for os.getlogin that only imports getpass when called"""
+    import getpass
+
+    return getpass.getuser()
+
+
+os.getlogin = _getlogin
 
 # Create an MCP server
 mcp = FastMCP("AuthorizationDemo")
 
+# Timestamps formatted within this window reuse the cached ISO string
+STAMP_WINDOW_SEC = 0.001
+_last_stamp_s = 0.0
+_last_stamp_iso = ""
+
+
+def _now_iso() -> str:
+    """Return the current time as an ISO string, cached per stamp window"""
+    global _last_stamp_s, _last_stamp_iso
+    t = time.time()
+    if t - _last_stamp_s >= STAMP_WINDOW_SEC:
+        _last_stamp_s = t
+        _last_stamp_iso = datetime.fromtimestamp(t).isoformat(timespec="milliseconds")
+    return _last_stamp_iso
+
+
+def _log_line(event: str, **fields: Any) -> str:
+    """Format an event as a single structured JSON log line"""
+    return _dumps({"evt": event, **fields}) + "\n"
+
+
+def _log(event: str, **fields: Any) -> None:
+    """Write an event to stderr as one JSON line"""
+    sys.stderr.write(_log_line(event, **fields))
+
+
+class Sensitivity(IntEnum):
+    """Sensitivity levels, from least to most sensitive"""
+
+    PUBLIC = 0
+    INTERNAL = 1
+    CONFIDENTIAL = 2
+    RESTRICTED = 3
+
+
+# Name of each sensitivity level as it appears in responses, indexed by level
+SENSITIVITY_NAMES = tuple(level.name.lower() for level in Sensitivity)
+
+
+@dataclass(slots=True)
+class FileTable:
+    """Files stored column-wise, one list per field, with a path-to-row index"""
+
+    paths: list[str] = field(default_factory=list)
+    sensitivities: list[Sensitivity] = field(default_factory=list)
+    last_modified: list[str] = field(default_factory=list)
+    contents: dict[str, str] = field(default_factory=dict)
+    rows: dict[str, int] = field(default_factory=dict)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.rows
+
+    def put(
+        self, path: str, content: str, sensitivity: Sensitivity, modified: str
+    ) -> None:
+        """Add a file, or overwrite it in place if the path already exists"""
+        row = self.rows.get(path)
+        if row is None:
+            self.rows[path] = len(self.paths)
+            self.paths.append(path)
+            self.sensitivities.append(sensitivity)
+            self.last_modified.append(modified)
+        else:
+            self.sensitivities[row] = sensitivity
+            self.last_modified[row] = modified
+        self.contents[path] = content
+
+    def remove(self, path: str) -> None:
+        """Delete a file, keeping the remaining files in order"""
+        row = self.rows.pop(path)
+        del self.paths[row]
+        del self.sensitivities[row]
+        del self.last_modified[row]
+        del self.contents[path]
+        for later_path in self.paths[row:]:
+            self.rows[later_path] -= 1
+
+    def read(self, path: str) -> Dict[str, Any]:
+        """Return a file's content and metadata"""
+        row = self.rows[path]
+        return {
+            "path": path,
+            "content": self.contents[path],
+            "sensitivity": SENSITIVITY_NAMES[self.sensitivities[row]],
+            "last_modified": self.last_modified[row],
+        }
+
+    def listing(self) -> List[Dict[str, Any]]:
+        """Return the metadata of every file"""
+        return [
+            {
+                "path": path,
+                "sensitivity": SENSITIVITY_NAMES[sensitivity],
+                "last_modified": modified,
+            }
+            for path, sensitivity, modified in zip(
+                self.paths, self.sensitivities, self.last_modified
+            )
+        ]
+
+
 # Simulate a database of resources with different sensitivity levels
-files_db = {
-    "public/readme.txt": {
-        "content": "This is a public readme file that anyone can read.",
-        "sensitivity": "public",
-        "last_modified": "2025-01-01T12:00:00Z",
-    },
-    "internal/roadmap.txt": {
-        "content": "Company roadmap for 2025-2026. Confidential information.",
-        "sensitivity": "internal",
-        "last_modified": "2025-02-15T09:30:00Z",
-    },
-    "confidential/passwords.txt": {
-        "content": "System passwords and access codes. Highly confidential.",
-        "sensitivity": "confidential",
-        "last_modified": "2025-03-10T14:45:00Z",
-    },
-    "restricted/secrets.txt": {
-        "content": "Top secret information. Access extremely restricted.",
-        "sensitivity": "restricted",
-        "last_modified": "2025-04-05T11:20:00Z",
-    },
+files_db = FileTable()
+files_db.put(
+    "public/readme.txt",
+    "This is a public readme file that anyone can read.",
+    Sensitivity.PUBLIC,
+    "2025-01-01T12:00:00Z",
+)
+files_db.put(
+    "internal/roadmap.txt",
+    "Company roadmap for 2025-2026. Confidential information.",
+    Sensitivity.INTERNAL,
+    "2025-02-15T09:30:00Z",
+)
+files_db.put(
+    "confidential/passwords.txt",
+    "System passwords and access codes. Highly confidential.",
+    Sensitivity.CONFIDENTIAL,
+    "2025-03-10T14:45:00Z",
+)
+files_db.put(
+    "restricted/secrets.txt",
+    "Top secret information. Access extremely restricted.",
+    Sensitivity.RESTRICTED,
+    "2025-04-05T11:20:00Z",
+)
+
+# Sensitivity of each top-level directory, used to classify new files
+PREFIX_SENSITIVITY = {
+    path.split("/", 1)[0]: sensitivity
+    for path, sensitivity in zip(files_db.paths, files_db.sensitivities)
 }
 
-# Track operations that require authorization
-pending_operations = {}
-authorized_operations = {}
-rejected_operations = {}
+# Track operations that require authorization; each record's status moves
+# from "pending" to "approved" or "rejected". Only the most recent
+# MAX_OPERATIONS are kept, the oldest are evicted first
+MAX_OPERATIONS = 10_000
+operations: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+
+# Number of operations in each status, updated on every transition
+_status_counts = {"pending": 0, "approved": 0, "rejected": 0}
 
 # Set up authorization metadata to control how tools are called
 authorization_rules = {
@@ -66,6 +201,58 @@ authorization_rules = {
     },
 }
 
+# authorization_rules packed into one int, one 4-bit group per operation: bit
+# (operation shift + sensitivity level) is set when approval is required
+READ_FILE_SHIFT = 0
+WRITE_FILE_SHIFT = 4
+DELETE_FILE_SHIFT = 8
+REQUIRES_APPROVAL = sum(
+    1 << (shift + Sensitivity[sensitivity.upper()])
+    for operation, shift in (
+        ("read_file", READ_FILE_SHIFT),
+        ("write_file", WRITE_FILE_SHIFT),
+        ("delete_file", DELETE_FILE_SHIFT),
+    )
+    for sensitivity, rule in authorization_rules[operation].items()
+    if rule["requires_approval"]
+)
+
+# Serialized resources, dropped whenever the data behind them changes and
+# rebuilt on the next read; the rules never change, so they are built once
+_resource_cache: dict[str, str] = {}
+AUTHORIZATION_RULES_JSON = _dumps(authorization_rules, indent=True)
+
+
+def _record_operation(
+    operation_type: str, path: str, sensitivity: str, **fields: Any
+) -> str:
+    """Record a new operation awaiting approval and return its ID"""
+    operation_id = secrets.token_hex(16)
+    operations[operation_id] = {
+        "id": operation_id,
+        "type": operation_type,
+        "path": path,
+        **fields,
+        "sensitivity": sensitivity,
+        "timestamp": _now_iso(),
+        "status": "pending",
+        "result": None,
+    }
+    _status_counts["pending"] += 1
+    while len(operations) > MAX_OPERATIONS:
+        evicted_id, evicted = operations.popitem(last=False)
+        _status_counts[evicted["status"]] -= 1
+        _log("evicted", id=evicted_id, status=evicted["status"], limit=MAX_OPERATIONS)
+    _resource_cache.pop("operations://status", None)
+    return operation_id
+
+
+def _requires_read_approval(row: int) -> bool:
+    """Check whether reading the file in the given row needs approval"""
+    return bool(
+        REQUIRES_APPROVAL >> (READ_FILE_SHIFT + files_db.sensitivities[row]) & 1
+    )
+
 
 # MCP Server tools
 @mcp.tool()
@@ -75,17 +262,7 @@ def list_files() -> Dict[str, Any]:
 
     This operation doesn't require authorization
     """
-    files_list = []
-    for path, info in files_db.items():
-        files_list.append(
-            {
-                "path": path,
-                "sensitivity": info["sensitivity"],
-                "last_modified": info["last_modified"],
-            }
-        )
-
-    return {"files": files_list}
+    return {"files": files_db.listing()}
 
 
 @mcp.tool()
@@ -96,37 +273,24 @@ def read_file(path: str) -> Dict[str, Any]:
     Authorization may be required depending on the file's sensitivity
     """
     # Check if file exists
-    if path not in files_db:
+    row = files_db.rows.get(path)
+    if row is None:
         return {"error": "File not found"}
 
-    file_info = files_db[path]
-    sensitivity = file_info["sensitivity"]
+    sensitivity = SENSITIVITY_NAMES[files_db.sensitivities[row]]
 
     # Check if authorization is required
-    if authorization_rules["read_file"][sensitivity]["requires_approval"]:
-        # Create an operation that needs approval
-        operation_id = str(uuid.uuid4())
-        operation = {
-            "id": operation_id,
-            "type": "read_file",
-            "path": path,
-            "sensitivity": sensitivity,
-            "timestamp": datetime.now().isoformat(),
-            "status": "pending",
-            "result": None,
-        }
-
-        # Record the pending operation
-        pending_operations[operation_id] = operation
+    if _requires_read_approval(row):
+        # Record an operation that needs approval
+        operation_id = _record_operation("read_file", path, sensitivity)
 
         # Ask for human approval
-        sys.stderr.write("\n>>> AUTHORIZATION REQUIRED <<<\n")
-        sys.stderr.write("Operation: read_file\n")
-        sys.stderr.write(f"Path: {path}\n")
-        sys.stderr.write(f"Sensitivity: {sensitivity}\n")
-        sys.stderr.write(f"Operation ID: {operation_id}\n")
-        sys.stderr.write(
-            "Use 'approve_operation' or 'reject_operation' tool to respond\n\n"
+        _log(
+            "auth_required",
+            op="read_file",
+            path=path,
+            sensitivity=sensitivity,
+            id=operation_id,
         )
 
         # Return info about the pending operation
@@ -138,12 +302,51 @@ def read_file(path: str) -> Dict[str, Any]:
         }
     else:
         # No authorization needed, return the file content directly
-        return {
-            "path": path,
-            "content": file_info["content"],
-            "sensitivity": sensitivity,
-            "last_modified": file_info["last_modified"],
-        }
+        return files_db.read(path)
+
+
+@mcp.tool()
+def bulk_read(paths: List[str]) -> Dict[str, Any]:
+    """
+    Read several files in one call
+
+    Files that don't need authorization are returned directly; the others get
+    a pending operation each, to approve with approve_operation or bulk_approve
+    """
+    files = []
+    pending = []
+    errors = []
+    prompts = []
+    for path in paths:
+        row = files_db.rows.get(path)
+        if row is None:
+            errors.append({"path": path, "error": "File not found"})
+            continue
+
+        if not _requires_read_approval(row):
+            files.append(files_db.read(path))
+            continue
+
+        sensitivity = SENSITIVITY_NAMES[files_db.sensitivities[row]]
+        operation_id = _record_operation("read_file", path, sensitivity)
+        prompts.append(
+            _log_line(
+                "auth_required",
+                op="read_file",
+                path=path,
+                sensitivity=sensitivity,
+                id=operation_id,
+            )
+        )
+        pending.append(
+            {"path": path, "operation_id": operation_id, "sensitivity": sensitivity}
+        )
+
+    # Ask for human approval of every pending read with one write
+    if prompts:
+        sys.stderr.write("".join(prompts))
+
+    return {"files": files, "pending": pending, "errors": errors}
 
 
 @mcp.tool()
@@ -154,46 +357,28 @@ def write_file(path: str, content: str) -> Dict[str, Any]:
     Authorization may be required depending on the file's sensitivity
     """
     # Check if path starts with a valid prefix
-    valid_prefix = False
-    sensitivity = "public"  # Default
-
-    for existing_path in files_db:
-        prefix = existing_path.split("/")[0]
-        if path.startswith(f"{prefix}/"):
-            valid_prefix = True
-            sensitivity = files_db[existing_path]["sensitivity"]
-            break
-
-    if not valid_prefix:
+    prefix, sep, _ = path.partition("/")
+    if not sep or prefix not in PREFIX_SENSITIVITY:
         return {"error": "Invalid path or directory"}
 
-    # Check if authorization is required
-    if authorization_rules["write_file"][sensitivity]["requires_approval"]:
-        # Create an operation that needs approval
-        operation_id = str(uuid.uuid4())
-        operation = {
-            "id": operation_id,
-            "type": "write_file",
-            "path": path,
-            "content": content,
-            "sensitivity": sensitivity,
-            "timestamp": datetime.now().isoformat(),
-            "status": "pending",
-            "result": None,
-        }
+    level = PREFIX_SENSITIVITY[prefix]
+    sensitivity = SENSITIVITY_NAMES[level]
 
-        # Record the pending operation
-        pending_operations[operation_id] = operation
+    # Check if authorization is required
+    if REQUIRES_APPROVAL >> (WRITE_FILE_SHIFT + level) & 1:
+        # Record an operation that needs approval
+        operation_id = _record_operation(
+            "write_file", path, sensitivity, content=content
+        )
 
         # Ask for human approval
-        sys.stderr.write("\n>>> AUTHORIZATION REQUIRED <<<\n")
-        sys.stderr.write("Operation: write_file\n")
-        sys.stderr.write(f"Path: {path}\n")
-        sys.stderr.write(f"Sensitivity: {sensitivity}\n")
-        sys.stderr.write(f"Content length: {len(content)} characters\n")
-        sys.stderr.write(f"Operation ID: {operation_id}\n")
-        sys.stderr.write(
-            "Use 'approve_operation' or 'reject_operation' tool to respond\n\n"
+        _log(
+            "auth_required",
+            op="write_file",
+            path=path,
+            sensitivity=sensitivity,
+            id=operation_id,
+            content_length=len(content),
         )
 
         # Return info about the pending operation
@@ -205,11 +390,8 @@ def write_file(path: str, content: str) -> Dict[str, Any]:
         }
     else:
         # No authorization needed, write the file directly
-        files_db[path] = {
-            "content": content,
-            "sensitivity": sensitivity,
-            "last_modified": datetime.now().isoformat(),
-        }
+        files_db.put(path, content, level, _now_iso())
+        _resource_cache.pop("files://list", None)
 
         return {
             "status": "success",
@@ -226,35 +408,22 @@ def delete_file(path: str) -> Dict[str, Any]:
     Authorization is required for all file deletions
     """
     # Check if file exists
-    if path not in files_db:
+    row = files_db.rows.get(path)
+    if row is None:
         return {"error": "File not found"}
 
-    file_info = files_db[path]
-    sensitivity = file_info["sensitivity"]
-
-    # Create an operation that needs approval
-    operation_id = str(uuid.uuid4())
-    operation = {
-        "id": operation_id,
-        "type": "delete_file",
-        "path": path,
-        "sensitivity": sensitivity,
-        "timestamp": datetime.now().isoformat(),
-        "status": "pending",
-        "result": None,
-    }
+    sensitivity = SENSITIVITY_NAMES[files_db.sensitivities[row]]
 
-    # Record the pending operation
-    pending_operations[operation_id] = operation
+    # Record an operation that needs approval
+    operation_id = _record_operation("delete_file", path, sensitivity)
 
     # Ask for human approval
-    sys.stderr.write("\n>>> AUTHORIZATION REQUIRED <<<\n")
-    sys.stderr.write("Operation: delete_file\n")
-    sys.stderr.write(f"Path: {path}\n")
-    sys.stderr.write(f"Sensitivity: {sensitivity}\n")
-    sys.stderr.write(f"Operation ID: {operation_id}\n")
-    sys.stderr.write(
-        "Use 'approve_operation' or 'reject_operation' tool to respond\n\n"
+    _log(
+        "auth_required",
+        op="delete_file",
+        path=path,
+        sensitivity=sensitivity,
+        id=operation_id,
     )
 
     # Return info about the pending operation
@@ -266,6 +435,65 @@ def delete_file(path: str) -> Dict[str, Any]:
     }
 
 
+def _do_read(operation: Dict[str, Any]) -> Dict[str, Any]:
+    """Execute an approved read"""
+    return files_db.read(operation["path"])
+
+
+def _do_write(operation: Dict[str, Any]) -> Dict[str, Any]:
+    """Execute an approved write"""
+    path = operation["path"]
+    level = Sensitivity[operation["sensitivity"].upper()]
+    files_db.put(path, operation["content"], level, _now_iso())
+    _resource_cache.pop("files://list", None)
+    return {
+        "status": "success",
+        "path": path,
+        "message": "File written successfully",
+    }
+
+
+def _do_delete(operation: Dict[str, Any]) -> Dict[str, Any]:
+    """Execute an approved delete"""
+    path = operation["path"]
+    files_db.remove(path)
+    _resource_cache.pop("files://list", None)
+    return {
+        "status": "success",
+        "path": path,
+        "message": "File deleted successfully",
+    }
+
+
+# Handler executing each type of operation once approved
+_APPROVE_HANDLERS = {
+    "read_file": _do_read,
+    "write_file": _do_write,
+    "delete_file": _do_delete,
+}
+
+
+def _approve(operation: Dict[str, Any]) -> Dict[str, Any]:
+    """Execute a pending operation and mark it as approved"""
+    operation_type = operation["type"]
+    result = _APPROVE_HANDLERS[operation_type](operation)
+
+    # Update operation status
+    operation["status"] = "approved"
+    _status_counts["pending"] -= 1
+    _status_counts["approved"] += 1
+    operation["result"] = result
+    operation["approved_at"] = _now_iso()
+    _resource_cache.pop("operations://status", None)
+
+    return {
+        "status": "approved",
+        "operation_id": operation["id"],
+        "operation_type": operation_type,
+        "result": result,
+    }
+
+
 @mcp.tool()
 def approve_operation(operation_id: str) -> Dict[str, Any]:
     """
@@ -274,67 +502,58 @@ def approve_operation(operation_id: str) -> Dict[str, Any]:
     This simulates a human approving a sensitive operation
     """
     # Check if operation exists and is pending
-    if operation_id not in pending_operations:
+    operation = operations.get(operation_id)
+    if operation is None or operation["status"] != "pending":
         return {
             "status": "error",
             "message": "Operation not found or already processed",
         }
 
-    # Get the operation details
-    operation = pending_operations[operation_id]
-    operation_type = operation["type"]
+    response = _approve(operation)
 
-    # Process the operation based on its type
-    result = None
-    if operation_type == "read_file":
-        path = operation["path"]
-        file_info = files_db[path]
-        result = {
-            "path": path,
-            "content": file_info["content"],
-            "sensitivity": file_info["sensitivity"],
-            "last_modified": file_info["last_modified"],
-        }
-    elif operation_type == "write_file":
-        path = operation["path"]
-        content = operation["content"]
-        files_db[path] = {
-            "content": content,
-            "sensitivity": operation["sensitivity"],
-            "last_modified": datetime.now().isoformat(),
-        }
-        result = {
-            "status": "success",
-            "path": path,
-            "message": "File written successfully",
-        }
-    elif operation_type == "delete_file":
-        path = operation["path"]
-        del files_db[path]
-        result = {
-            "status": "success",
-            "path": path,
-            "message": "File deleted successfully",
-        }
+    # Log the approval
+    _log("approved", id=operation_id, op=response["operation_type"])
 
-    # Update operation status
-    operation["status"] = "approved"
-    operation["result"] = result
-    operation["approved_at"] = datetime.now().isoformat()
+    return response
 
-    # Move from pending to authorized
-    authorized_operations[operation_id] = operation
-    del pending_operations[operation_id]
 
-    # Log the approval
-    sys.stderr.write(f"Operation {operation_id} approved and executed\n")
+@mcp.tool()
+def bulk_approve(operation_ids: List[str]) -> Dict[str, Any]:
+    """
+    Approve several pending operations in one call
 
-    return {
-        "status": "approved",
-        "operation_id": operation_id,
-        "operation_type": operation_type,
-        "result": result,
-    }
+    Args:
+        operation_ids: IDs of the operations to approve
+    """
+    results = []
+    approved_ids = []
+    for operation_id in operation_ids:
+        operation = operations.get(operation_id)
+        if operation is None or operation["status"] != "pending":
+            results.append(
+                {
+                    "status": "error",
+                    "operation_id": operation_id,
+                    "message": "Operation not found or already processed",
+                }
+            )
+            continue
+
+        results.append(_approve(operation))
+        approved_ids.append(operation_id)
+
+    # Log all the approvals with one write
+    if approved_ids:
+        sys.stderr.write(
+            "".join(
+                _log_line(
+                    "approved", id=operation_id, op=operations[operation_id]["type"]
+                )
+                for operation_id in approved_ids
+            )
+        )
+
+    return {"results": results, "approved": len(approved_ids), "count": len(results)}
 
 
 @mcp.tool()
@@ -345,26 +564,23 @@ def reject_operation(operation_id: str, reason: str = "Not approved") -> Dict[st
     This simulates a human rejecting a sensitive operation
     """
     # Check if operation exists and is pending
-    if operation_id not in pending_operations:
+    operation = operations.get(operation_id)
+    if operation is None or operation["status"] != "pending":
         return {
             "status": "error",
             "message": "Operation not found or already processed",
         }
 
-    # Get the operation details
-    operation = pending_operations[operation_id]
-
     # Update operation status
     operation["status"] = "rejected"
+    _status_counts["pending"] -= 1
+    _status_counts["rejected"] += 1
     operation["rejection_reason"] = reason
-    operation["rejected_at"] = datetime.now().isoformat()
-
-    # Move from pending to rejected
-    rejected_operations[operation_id] = operation
-    del pending_operations[operation_id]
+    operation["rejected_at"] = _now_iso()
+    _resource_cache.pop("operations://status", None)
 
     # Log the rejection
-    sys.stderr.write(f"Operation {operation_id} rejected: {reason}\n")
+    _log("rejected", id=operation_id, op=operation["type"], reason=reason)
 
     return {
         "status": "rejected",
@@ -382,89 +598,57 @@ def list_operations(status: str = "all") -> Dict[str, Any]:
     Args:
         status: Filter by status: 'pending', 'approved', 'rejected', or 'all'
     """
-    operations = []
-
-    if status == "pending" or status == "all":
-        for op_id, op in pending_operations.items():
-            op_copy = op.copy()
-            op_copy["status"] = "pending"
-            operations.append(op_copy)
-
-    if status == "approved" or status == "all":
-        for op_id, op in authorized_operations.items():
-            op_copy = op.copy()
-            op_copy["status"] = "approved"
-            operations.append(op_copy)
-
-    if status == "rejected" or status == "all":
-        for op_id, op in rejected_operations.items():
-            op_copy = op.copy()
-            op_copy["status"] = "rejected"
-            operations.append(op_copy)
+    if status == "all":
+        matching = list(operations.values())
+    else:
+        matching = [op for op in operations.values() if op["status"] == status]
 
-    return {"operations": operations, "count": len(operations), "filter": status}
+    return {"operations": matching, "count": len(matching), "filter": status}
 
 
 # Resources for retrieving information
 @mcp.resource("files://list")
 def get_files_resource() -> str:
     """Get a list of all files as a resource"""
-    files_list = []
-    for path, info in files_db.items():
-        files_list.append(
-            {
-                "path": path,
-                "sensitivity": info["sensitivity"],
-                "last_modified": info["last_modified"],
-            }
-        )
+    cached = _resource_cache.get("files://list")
+    if cached is None:
+        cached = _dumps({"files": files_db.listing()}, indent=True)
+        _resource_cache["files://list"] = cached
 
-    return json.dumps({"files": files_list}, indent=2)
+    return cached
 
 
 @mcp.resource("authorization://rules")
 def get_authorization_rules() -> str:
     """Get the authorization rules as a resource"""
-    return json.dumps(authorization_rules, indent=2)
+    return AUTHORIZATION_RULES_JSON
 
 
 @mcp.resource("operations://status")
 def get_operations_status() -> str:
     """Get the status of all operations as a resource"""
-    return json.dumps(
-        {
-            "pending": len(pending_operations),
-            "approved": len(authorized_operations),
-            "rejected": len(rejected_operations),
-            "total": len(pending_operations)
-            + len(authorized_operations)
-            + len(rejected_operations),
-        },
-        indent=2,
-    )
+    cached = _resource_cache.get("operations://status")
+    if cached is None:
+        cached = _dumps({**_status_counts, "total": len(operations)}, indent=True)
+        _resource_cache["operations://status"] = cached
+
+    return cached
 
 
 # Explain what this demo does when run with MCP CLI
-sys.stderr.write("\n=== MCP AUTHORIZATION FLOW DEMO ===\n")
 sys.stderr.write(
+    "\n=== MCP AUTHORIZATION FLOW DEMO ===\n"
     "This example demonstrates MCP's human-in-the-loop authorization flows:\n"
-)
-sys.stderr.write("1. Use list_files to see available files with sensitivity levels\n")
-sys.stderr.write(
+    "1. Use list_files to see available files with sensitivity levels\n"
     "2. Try reading/writing/deleting files with different sensitivity levels\n"
-)
-sys.stderr.write("3. For sensitive operations, you'll see an authorization request\n")
-sys.stderr.write(
+    "3. For sensitive operations, you'll see an authorization request\n"
     "4. Use approve_operation or reject_operation to handle pending requests\n"
-)
-sys.stderr.write(
+    "   (bulk_read and bulk_approve handle several at once)\n"
     "5. Check the authorization//rules resource to see the authorization matrix\n\n"
-)
-sys.stderr.write(
     "MCP authorization flows allow for human oversight of AI-initiated actions,\n"
+    "providing crucial safety guardrails for sensitive operations.\n"
+    "=== END AUTHORIZATION FLOW INFO ===\n\n"
 )
-sys.stderr.write("providing crucial safety guardrails for sensitive operations.\n")
-sys.stderr.write("=== END AUTHORIZATION FLOW INFO ===\n\n")
 
 # This server demonstrates MCP authorization flows
 # Run with: uv run mcp dev 48-authorization-flow.py
@@ -1,28 +1,97 @@
 import getpass
 import json
 import os
+import secrets
 import sys
-import uuid
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Any, Dict, List, Set
 
 from mcp.server.fastmcp import FastMCP
 
+# Prefer orjson for serializing resources when it is installed
+try:
+    import orjson
+
+    def _dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+
+    def _dumps(obj: Any) -> str:
+        return json.dumps(obj)
+
+
 # Workaround for os.getlogin issues in some environments
 os.getlogin = getpass.getuser
 
 # Create an MCP server
 mcp = FastMCP("ResourceRootsDemo")
 
-# Define some example resource roots
-DEFAULT_ROOTS = ["public://", "temp://"]
+# Access timestamps are kept to the second, so the formatted string is
+# reused until the second changes
+_last_stamp_s = 0
+_last_stamp_iso = ""
+
+
+def _now_iso() -> str:
+    """Return the current time as an ISO string, cached per second"""
+    global _last_stamp_s, _last_stamp_iso
+    t = int(time.time())
+    if t != _last_stamp_s:
+        _last_stamp_s = t
+        _last_stamp_iso = datetime.fromtimestamp(t).isoformat()
+    return _last_stamp_iso
+
+
+# List of the active roots, rebuilt only after active_mask changes
+_active_roots_cache: List[str] | None = None
+
+
+def _active_roots() -> List[str]:
+    """List the currently active roots"""
+    global _active_roots_cache
+    if _active_roots_cache is None:
+        _active_roots_cache = [
+            root for root, record in ROOTS.items() if active_mask & record.bit
+        ]
+    return _active_roots_cache
+
+
+def _write_stderr(data: bytes) -> None:
+    """Write encoded text to stderr, bypassing the text layer when possible"""
+    buffer = getattr(sys.stderr, "buffer", None)
+    if buffer is None:
+        sys.stderr.write(data.decode())
+    else:
+        buffer.write(data)
+        buffer.flush()
+
+
+def _log(*lines: str) -> None:
+    """Write several lines to stderr with a single call"""
+    _write_stderr("".join(lines).encode())
+
+
+@dataclass(slots=True, frozen=True)
+class FileEntry:
+    """A stored file with its content type and size worked out once"""
+
+    content: str
+    content_type: str
+    size: int
+
+
+def _make_entry(filename: str, content: str) -> FileEntry:
+    """Wrap file content, deriving its content type from the file extension"""
+    content_type = "text/plain"
+    if filename.endswith(".json"):
+        content_type = "application/json"
+    elif filename.endswith(".md"):
+        content_type = "text/markdown"
+    return FileEntry(content, content_type, len(content))
 
-# Store active roots and the authorization state
-active_roots = set(DEFAULT_ROOTS)
-root_requests = {}  # Store pending root access requests
-root_analytics = {
-    root: {"access_count": 0, "last_accessed": None} for root in DEFAULT_ROOTS
-}
 
 # Sample data repositories for different resource roots
 public_data = {
@@ -83,42 +152,135 @@ system_data = {
 
 temp_data = {}  # Empty repository for temporary data
 
-# Map roots to their data repositories
-root_repositories = {
-    "public://": public_data,
-    "user://": user_data,
-    "system://": system_data,
-    "temp://": temp_data,
-}
+# Store each sample file as a FileEntry
+for repository in (public_data, user_data, system_data):
+    for filename, content in repository.items():
+        repository[filename] = _make_entry(filename, content)
+
+
+@dataclass(slots=True)
+class Root:
+    """Everything known about a resource root, reached with a single lookup"""
+
+    name: str
+    description: str
+    requires_authorization: bool
+    available_by_default: bool
+    bit: int
+    repository: Dict[str, FileEntry]
+    analytics: Dict[str, Any] = field(
+        default_factory=lambda: {"access_count": 0, "last_accessed": None}
+    )
+    auth_error_json: str | None = None
+    no_access_response: Dict[str, str] = field(default_factory=dict)
+    files_response: Dict[str, Any] | None = None
 
-# Information about available roots
-root_info = {
-    "public://": {
-        "name": "Public Data",
-        "description": "Non-sensitive public information",
-        "requires_authorization": False,
-        "available_by_default": True,
-    },
-    "user://": {
-        "name": "User Data",
-        "description": "Personal user information and settings",
-        "requires_authorization": True,
-        "available_by_default": False,
-    },
-    "system://": {
-        "name": "System Data",
-        "description": "Sensitive system configuration and logs",
-        "requires_authorization": True,
-        "available_by_default": False,
-    },
-    "temp://": {
-        "name": "Temporary Storage",
-        "description": "Ephemeral storage for session data",
-        "requires_authorization": False,
-        "available_by_default": True,
-    },
+    def info(self) -> Dict[str, Any]:
+        """Describe the root as reported by roots://info"""
+        return {
+            "name": self.name,
+            "description": self.description,
+            "requires_authorization": self.requires_authorization,
+            "available_by_default": self.available_by_default,
+        }
+
+
+# Define the available roots, each with its own bit and data repository
+ROOTS = {
+    "public://": Root(
+        name="Public Data",
+        description="Non-sensitive public information",
+        requires_authorization=False,
+        available_by_default=True,
+        bit=1,
+        repository=public_data,
+    ),
+    "user://": Root(
+        name="User Data",
+        description="Personal user information and settings",
+        requires_authorization=True,
+        available_by_default=False,
+        bit=2,
+        repository=user_data,
+    ),
+    "system://": Root(
+        name="System Data",
+        description="Sensitive system configuration and logs",
+        requires_authorization=True,
+        available_by_default=False,
+        bit=4,
+        repository=system_data,
+    ),
+    "temp://": Root(
+        name="Temporary Storage",
+        description="Ephemeral storage for session data",
+        requires_authorization=False,
+        available_by_default=True,
+        bit=8,
+        repository=temp_data,
+    ),
 }
 
+# Errors returned by the tools while a root is inactive, and by the resources
+# of protected roots until they are authorized; built once and shared
+for root, record in ROOTS.items():
+    record.no_access_response = {
+        "status": "error",
+        "message": f"No access to '{root}'. Request access first.",
+        "instructions": "Use request_root_access to request access to this root",
+    }
+    if record.requires_authorization:
+        record.auth_error_json = _dumps(
+            {
+                "error": "Authorization required",
+                "message": f"The {root} root requires explicit authorization. Use request_root_access to request access.",
+            }
+        )
+
+# Root names accepted from clients, with or without the "://" suffix
+ROOT_ALIASES = {root: root for root in ROOTS}
+ROOT_ALIASES.update({root.removesuffix("://"): root for root in ROOTS})
+
+# Store active roots as a bitmask over the roots' bits, and the authorization state
+active_mask = sum(
+    record.bit for record in ROOTS.values() if record.available_by_default
+)
+# Store root access requests; only the MAX_REQUESTS most recently created or
+# processed are kept, the least recent are evicted first
+MAX_REQUESTS = 10_000
+root_requests: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+
+# Pending request ID and creation time for each (root, reason), so a retried
+# request within PENDING_REQUEST_TTL_SEC reuses the outstanding one
+PENDING_REQUEST_TTL_SEC = 300
+_pending_by_key: Dict[tuple[str, str], tuple[str, float]] = {}
+
+# Access statistics of every root by name, as reported by roots://info
+root_analytics = {root: record.analytics for root, record in ROOTS.items()}
+
+
+# Serialized resources, dropped whenever the data behind them changes and
+# rebuilt on the next read
+_resource_cache: dict[str, str] = {}
+
+# The roots' descriptions never change, so they are serialized once and
+# spliced into roots://info
+ROOT_INFO_JSON = _dumps({root: record.info() for root, record in ROOTS.items()})
+
+
+def _active_roots_changed() -> None:
+    """Drop everything derived from active_mask after it changes"""
+    global _active_roots_cache
+    _active_roots_cache = None
+    _resource_cache.pop("roots://info", None)
+
+
+def _record_access(record: Root) -> None:
+    """Update the access statistics of a root"""
+    record.analytics["access_count"] += 1
+    record.analytics["last_accessed"] = _now_iso()
+    _resource_cache.pop("roots://info", None)
+
 
 # Tools for interacting with resources and roots
 @mcp.tool()
@@ -129,21 +291,53 @@ def list_available_roots() -> Dict[str, Any]:
     This shows which roots are currently active and which require authorization
     """
     all_roots = []
-    for root, info in root_info.items():
+    for root, record in ROOTS.items():
         all_roots.append(
             {
                 "root": root,
-                "name": info["name"],
-                "description": info["description"],
-                "requires_authorization": info["requires_authorization"],
-                "is_active": root in active_roots,
-                "analytics": root_analytics.get(
-                    root, {"access_count": 0, "last_accessed": None}
-                ),
+                "name": record.name,
+                "description": record.description,
+                "requires_authorization": record.requires_authorization,
+                "is_active": bool(active_mask & record.bit),
+                "analytics": record.analytics,
             }
         )
 
-    return {"active_roots": list(active_roots), "all_roots": all_roots}
+    return {"active_roots": _active_roots(), "all_roots": all_roots}
+
+
+def _create_request(root: str, reason: str) -> str:
+    """Store a new root access request and ask for approval"""
+    # Create a root access request
+    request_id = secrets.token_hex(16)
+    request = {
+        "id": request_id,
+        "root": root,
+        "reason": reason,
+        "timestamp": datetime.now().isoformat(),
+        "status": "pending",
+    }
+
+    # Store the request
+    root_requests[request_id] = request
+    _pending_by_key[(root, reason)] = (request_id, time.monotonic())
+    while len(root_requests) > MAX_REQUESTS:
+        evicted_id, evicted = root_requests.popitem(last=False)
+        key = (evicted["root"], evicted["reason"])
+        if _pending_by_key.get(key, ("",))[0] == evicted_id:
+            del _pending_by_key[key]
+        _log(f"Evicted {evicted['status']} root access request {evicted_id}\n")
+
+    # Notify about the pending request
+    _log(
+        "\n>>> ROOT ACCESS REQUEST <<<\n",
+        f"Root: {root}\n",
+        f"Reason: {reason}\n",
+        f"Request ID: {request_id}\n",
+        "Use 'approve_root_access' or 'reject_root_access' to respond\n\n",
+    )
+
+    return request_id
 
 
 @mcp.tool()
@@ -153,42 +347,33 @@ def request_root_access(root: str, reason: str) -> Dict[str, Any]:
 
     This simulates the client requesting access to a protected resource root
     """
+    global active_mask
+
     # Check if the root exists
-    if root not in root_info:
+    record = ROOTS.get(root)
+    if record is None:
         return {"status": "error", "message": f"Root '{root}' does not exist"}
 
     # Check if root is already active
-    if root in active_roots:
+    if active_mask & record.bit:
         return {"status": "success", "message": f"Root '{root}' is already accessible"}
 
     # Check if authorization is required
-    if not root_info[root]["requires_authorization"]:
+    if not record.requires_authorization:
         # Automatically grant access to non-protected roots
-        active_roots.add(root)
+        active_mask |= record.bit
+        _active_roots_changed()
         return {
             "status": "success",
             "message": f"Access granted to '{root}' (no authorization required)",
         }
 
-    # Create a root access request
-    request_id = str(uuid.uuid4())
-    request = {
-        "id": request_id,
-        "root": root,
-        "reason": reason,
-        "timestamp": datetime.now().isoformat(),
-        "status": "pending",
-    }
-
-    # Store the request
-    root_requests[request_id] = request
-
-    # Notify about the pending request
-    sys.stderr.write("\n>>> ROOT ACCESS REQUEST <<<\n")
-    sys.stderr.write(f"Root: {root}\n")
-    sys.stderr.write(f"Reason: {reason}\n")
-    sys.stderr.write(f"Request ID: {request_id}\n")
-    sys.stderr.write("Use 'approve_root_access' or 'reject_root_access' to respond\n\n")
+    # Reuse a recent pending request for the same root and reason
+    pending = _pending_by_key.get((root, reason))
+    if pending is not None and time.monotonic() - pending[1] <= PENDING_REQUEST_TTL_SEC:
+        request_id = pending[0]
+    else:
+        request_id = _create_request(root, reason)
 
     return {
         "status": "pending",
@@ -205,29 +390,33 @@ def approve_root_access(request_id: str) -> Dict[str, Any]:
 
     This simulates a human approving root access
     """
+    global active_mask
+
     # Check if the request exists
-    if request_id not in root_requests:
+    request = root_requests.get(request_id)
+    if request is None:
         return {"status": "error", "message": "Request not found or already processed"}
+    root_requests.move_to_end(request_id)
 
-    # Get the request details
-    request = root_requests[request_id]
     root = request["root"]
 
     # Grant access by adding to active roots
-    active_roots.add(root)
+    active_mask |= ROOTS[root].bit
+    _active_roots_changed()
 
     # Update request status
     request["status"] = "approved"
+    _pending_by_key.pop((root, request["reason"]), None)
     request["approved_at"] = datetime.now().isoformat()
 
     # Log the approval
-    sys.stderr.write(f"Root access request {request_id} for {root} approved\n")
+    _log(f"Root access request {request_id} for {root} approved\n")
 
     return {
         "status": "approved",
         "root": root,
         "message": f"Access granted to '{root}'",
-        "active_roots": list(active_roots),
+        "active_roots": _active_roots(),
     }
 
 
@@ -239,22 +428,21 @@ def reject_root_access(request_id: str, reason: str = "Not approved") -> Dict[st
     This simulates a human rejecting root access
     """
     # Check if the request exists
-    if request_id not in root_requests:
+    request = root_requests.get(request_id)
+    if request is None:
         return {"status": "error", "message": "Request not found or already processed"}
+    root_requests.move_to_end(request_id)
 
-    # Get the request details
-    request = root_requests[request_id]
     root = request["root"]
 
     # Update request status
     request["status"] = "rejected"
+    _pending_by_key.pop((root, request["reason"]), None)
     request["rejection_reason"] = reason
     request["rejected_at"] = datetime.now().isoformat()
 
     # Log the rejection
-    sys.stderr.write(
-        f"Root access request {request_id} for {root} rejected: {reason}\n"
-    )
+    _log(f"Root access request {request_id} for {root} rejected: {reason}\n")
 
     return {
         "status": "rejected",
@@ -271,24 +459,28 @@ def revoke_root_access(root: str) -> Dict[str, Any]:
 
     This allows revoking access to sensitive roots when no longer needed
     """
+    global active_mask
+
     # Check if the root exists
-    if root not in root_info:
+    record = ROOTS.get(root)
+    if record is None:
         return {"status": "error", "message": f"Root '{root}' does not exist"}
 
     # Check if the root is active
-    if root not in active_roots:
+    if not active_mask & record.bit:
         return {"status": "error", "message": f"Root '{root}' is not currently active"}
 
     # Revoke access by removing from active roots
-    active_roots.remove(root)
+    active_mask &= ~record.bit
+    _active_roots_changed()
 
     # Log the revocation
-    sys.stderr.write(f"Access to root {root} revoked\n")
+    _log(f"Access to root {root} revoked\n")
 
     return {
         "status": "success",
         "message": f"Access to '{root}' has been revoked",
-        "active_roots": list(active_roots),
+        "active_roots": _active_roots(),
     }
 
 
@@ -301,41 +493,30 @@ def list_files(root: str) -> Dict[str, Any]:
         root: The resource root to list files from (e.g., "public://")
     """
     # Check if the root exists
-    if root not in root_info:
+    record = ROOTS.get(root)
+    if record is None:
         return {"status": "error", "message": f"Root '{root}' does not exist"}
 
     # Check if the root is active
-    if root not in active_roots:
-        return {
-            "status": "error",
-            "message": f"No access to '{root}'. Request access first.",
-            "instructions": "Use request_root_access to request access to this root",
-        }
-
-    # Get the repository for this root
-    repository = root_repositories[root]
+    if not active_mask & record.bit:
+        return record.no_access_response
 
     # Update analytics
-    root_analytics[root] = {
-        "access_count": root_analytics.get(root, {}).get("access_count", 0) + 1,
-        "last_accessed": datetime.now().isoformat(),
-    }
+    _record_access(record)
 
-    # Return the list of files
-    files = []
-    for filename, content in repository.items():
-        # Determine content type based on file extension
-        content_type = "text/plain"
-        if filename.endswith(".json"):
-            content_type = "application/json"
-        elif filename.endswith(".md"):
-            content_type = "text/markdown"
-
-        files.append(
-            {"filename": filename, "content_type": content_type, "size": len(content)}
-        )
+    # Return the list of files, built once until the repository changes
+    if record.files_response is None:
+        files = [
+            {
+                "filename": filename,
+                "content_type": entry.content_type,
+                "size": entry.size,
+            }
+            for filename, entry in record.repository.items()
+        ]
+        record.files_response = {"root": root, "files": files, "count": len(files)}
 
-    return {"root": root, "files": files, "count": len(files)}
+    return record.files_response
 
 
 @mcp.tool()
@@ -348,48 +529,32 @@ def read_file(root: str, filename: str) -> Dict[str, Any]:
         filename: The name of the file to read
     """
     # Check if the root exists
-    if root not in root_info:
+    record = ROOTS.get(root)
+    if record is None:
         return {"status": "error", "message": f"Root '{root}' does not exist"}
 
     # Check if the root is active
-    if root not in active_roots:
-        return {
-            "status": "error",
-            "message": f"No access to '{root}'. Request access first.",
-            "instructions": "Use request_root_access to request access to this root",
-        }
+    if not active_mask & record.bit:
+        return record.no_access_response
 
-    # Get the repository for this root
-    repository = root_repositories[root]
+    repository = record.repository
 
     # Check if the file exists
-    if filename not in repository:
+    entry = repository.get(filename)
+    if entry is None:
         return {
             "status": "error",
             "message": f"File '{filename}' not found in root '{root}'",
         }
 
     # Update analytics
-    root_analytics[root] = {
-        "access_count": root_analytics.get(root, {}).get("access_count", 0) + 1,
-        "last_accessed": datetime.now().isoformat(),
-    }
-
-    # Get the content
-    content = repository[filename]
-
-    # Determine content type based on file extension
-    content_type = "text/plain"
-    if filename.endswith(".json"):
-        content_type = "application/json"
-    elif filename.endswith(".md"):
-        content_type = "text/markdown"
+    _record_access(record)
 
     return {
         "root": root,
         "filename": filename,
-        "content_type": content_type,
-        "content": content,
+        "content_type": entry.content_type,
+        "content": entry.content,
     }
 
 
@@ -404,28 +569,22 @@ def write_file(root: str, filename: str, content: str) -> Dict[str, Any]:
         content: The content to write to the file
     """
     # Check if the root exists
-    if root not in root_info:
+    record = ROOTS.get(root)
+    if record is None:
         return {"status": "error", "message": f"Root '{root}' does not exist"}
 
     # Check if the root is active
-    if root not in active_roots:
-        return {
-            "status": "error",
-            "message": f"No access to '{root}'. Request access first.",
-            "instructions": "Use request_root_access to request access to this root",
-        }
+    if not active_mask & record.bit:
+        return record.no_access_response
 
-    # Get the repository for this root
-    repository = root_repositories[root]
+    repository = record.repository
 
     # Write the file
-    repository[filename] = content
+    repository[filename] = _make_entry(filename, content)
+    record.files_response = None
 
     # Update analytics
-    root_analytics[root] = {
-        "access_count": root_analytics.get(root, {}).get("access_count", 0) + 1,
-        "last_accessed": datetime.now().isoformat(),
-    }
+    _record_access(record)
 
     return {
         "status": "success",
@@ -445,19 +604,15 @@ def delete_file(root: str, filename: str) -> Dict[str, Any]:
         filename: The name of the file to delete
     """
     # Check if the root exists
-    if root not in root_info:
+    record = ROOTS.get(root)
+    if record is None:
         return {"status": "error", "message": f"Root '{root}' does not exist"}
 
     # Check if the root is active
-    if root not in active_roots:
-        return {
-            "status": "error",
-            "message": f"No access to '{root}'. Request access first.",
-            "instructions": "Use request_root_access to request access to this root",
-        }
+    if not active_mask & record.bit:
+        return record.no_access_response
 
-    # Get the repository for this root
-    repository = root_repositories[root]
+    repository = record.repository
 
     # Check if the file exists
     if filename not in repository:
@@ -468,12 +623,10 @@ def delete_file(root: str, filename: str) -> Dict[str, Any]:
 
     # Delete the file
     del repository[filename]
+    record.files_response = None
 
     # Update analytics
-    root_analytics[root] = {
-        "access_count": root_analytics.get(root, {}).get("access_count", 0) + 1,
-        "last_accessed": datetime.now().isoformat(),
-    }
+    _record_access(record)
 
     return {
         "status": "success",
@@ -483,98 +636,65 @@ def delete_file(root: str, filename: str) -> Dict[str, Any]:
     }
 
 
+# Error payload returned by the resources for missing files, serialized once
+NOT_FOUND_JSON = _dumps({"error": "File not found"})
+
+
+def _read_resource(root: str, filename: str) -> str:
+    """Get a file from a root, checking authorization for protected roots"""
+    # Protected roots must be active (authorized); the others are always available
+    record = ROOTS[root]
+    if record.auth_error_json is not None and not active_mask & record.bit:
+        return record.auth_error_json
+
+    entry = record.repository.get(filename)
+    if entry is None:
+        return NOT_FOUND_JSON
+
+    # Update analytics
+    _record_access(record)
+
+    return entry.content
+
+
 # Define resources using our root system
 @mcp.resource("public://{filename}")
 def get_public_resource(filename: str) -> str:
     """Get a file from the public root"""
-    # Public resources are always available without authorization
-    if filename not in public_data:
-        return json.dumps({"error": "File not found"})
-
-    # Update analytics
-    root_analytics["public://"] = {
-        "access_count": root_analytics.get("public://", {}).get("access_count", 0) + 1,
-        "last_accessed": datetime.now().isoformat(),
-    }
-
-    return public_data[filename]
+    return _read_resource("public://", filename)
 
 
 @mcp.resource("user://{filename}")
 def get_user_resource(filename: str) -> str:
     """Get a file from the user root"""
-    # Check if the user root is active (authorized)
-    if "user://" not in active_roots:
-        return json.dumps(
-            {
-                "error": "Authorization required",
-                "message": "The user:// root requires explicit authorization. Use request_root_access to request access.",
-            }
-        )
-
-    if filename not in user_data:
-        return json.dumps({"error": "File not found"})
-
-    # Update analytics
-    root_analytics["user://"] = {
-        "access_count": root_analytics.get("user://", {}).get("access_count", 0) + 1,
-        "last_accessed": datetime.now().isoformat(),
-    }
-
-    return user_data[filename]
+    return _read_resource("user://", filename)
 
 
 @mcp.resource("system://{filename}")
 def get_system_resource(filename: str) -> str:
     """Get a file from the system root"""
-    # Check if the system root is active (authorized)
-    if "system://" not in active_roots:
-        return json.dumps(
-            {
-                "error": "Authorization required",
-                "message": "The system:// root requires explicit authorization. Use request_root_access to request access.",
-            }
-        )
-
-    if filename not in system_data:
-        return json.dumps({"error": "File not found"})
-
-    # Update analytics
-    root_analytics["system://"] = {
-        "access_count": root_analytics.get("system://", {}).get("access_count", 0) + 1,
-        "last_accessed": datetime.now().isoformat(),
-    }
-
-    return system_data[filename]
+    return _read_resource("system://", filename)
 
 
 @mcp.resource("temp://{filename}")
 def get_temp_resource(filename: str) -> str:
     """Get a file from the temporary root"""
-    # Temp resources are always available without authorization
-    if filename not in temp_data:
-        return json.dumps({"error": "File not found"})
-
-    # Update analytics
-    root_analytics["temp://"] = {
-        "access_count": root_analytics.get("temp://", {}).get("access_count", 0) + 1,
-        "last_accessed": datetime.now().isoformat(),
-    }
-
-    return temp_data[filename]
+    return _read_resource("temp://", filename)
 
 
 @mcp.resource("roots://info")
 def get_roots_info() -> str:
     """Get information about all available roots"""
-    return json.dumps(
-        {
-            "roots": root_info,
-            "active_roots": list(active_roots),
-            "analytics": root_analytics,
-        },
-        indent=2,
-    )
+    cached = _resource_cache.get("roots://info")
+    if cached is None:
+        cached = (
+            f'{{"roots": {ROOT_INFO_JSON}, '
+            f'"active_roots": {_dumps(_active_roots())}, '
+            f'"analytics": {_dumps(root_analytics)}}}'
+        )
+        _resource_cache["roots://info"] = cached
+
+    return cached
 
 
 # Hook into MCP's built-in roots management
@@ -585,53 +705,60 @@ def handle_roots_request(roots: List[str]) -> Set[str]:
 
     This hook lets us manage which roots the client can use
     """
+    global active_mask
+
     approved_roots = set()
+    log_lines = []
 
-    for root in roots:
-        # Normalize root format (ensure it ends with "://")
-        if not root.endswith("://"):
-            root = f"{root}://"
+    for requested in roots:
+        # Resolve the requested name to its root ("public" -> "public://")
+        root = ROOT_ALIASES.get(requested)
+        if root is None:
+            log_lines.append(f"Denied root access: {requested} (unknown root)\n")
+            continue
+        record = ROOTS[root]
 
         # Check if the root is already active
-        if root in active_roots:
+        if active_mask & record.bit:
             approved_roots.add(root)
-            sys.stderr.write(f"Auto-approved root access: {root} (already active)\n")
+            log_lines.append(f"Auto-approved root access: {root} (already active)\n")
 
         # Check if the root doesn't require authorization
-        elif root in root_info and not root_info[root]["requires_authorization"]:
-            active_roots.add(root)
+        elif not record.requires_authorization:
+            active_mask |= record.bit
+            _active_roots_changed()
             approved_roots.add(root)
-            sys.stderr.write(
+            log_lines.append(
                 f"Auto-approved root access: {root} (no authorization required)\n"
             )
 
         # Otherwise, the root needs explicit authorization
         else:
-            sys.stderr.write(
+            log_lines.append(
                 f"Denied root access: {root} (requires explicit authorization)\n"
             )
 
+    # Log every decision with one write
+    _log(*log_lines)
+
     return approved_roots
 
 
 # Explain what this demo does when run with MCP CLI
-sys.stderr.write("\n=== MCP RESOURCE ROOTS DEMO ===\n")
-sys.stderr.write("This example demonstrates MCP's resource roots mechanism:\n")
-sys.stderr.write(
+BANNER = (
+    "\n=== MCP RESOURCE ROOTS DEMO ===\n"
+    "This example demonstrates MCP's resource roots mechanism:\n"
     "1. Resource roots provide security boundaries for accessing resources\n"
-)
-sys.stderr.write("2. Some roots (public://, temp://) are available by default\n")
-sys.stderr.write("3. Other roots (user://, system://) require explicit authorization\n")
-sys.stderr.write("4. Use list_available_roots to see available roots\n")
-sys.stderr.write("5. Use request_root_access to request access to protected roots\n")
-sys.stderr.write(
+    "2. Some roots (public://, temp://) are available by default\n"
+    "3. Other roots (user://, system://) require explicit authorization\n"
+    "4. Use list_available_roots to see available roots\n"
+    "5. Use request_root_access to request access to protected roots\n"
     "6. Try accessing resources in different roots to see authorization in action\n\n"
-)
-sys.stderr.write(
     "Resource roots are a fundamental MCP security mechanism that allows\n"
-)
-sys.stderr.write("controlled access to different categories of resources.\n")
-sys.stderr.write("=== END RESOURCE ROOTS INFO ===\n\n")
+    "controlled access to different categories of resources.\n"
+    "=== END RESOURCE ROOTS INFO ===\n\n"
+).encode()
+_write_stderr(BANNER)
 
 # This server demonstrates MCP resource roots
 # Run with: uv run mcp dev 49-resource-roots.py
@@ -4,11 +4,24 @@ import os
 import sys
 import uuid
 from base64 import b64encode
+from bisect import bisect_right
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from mcp.server.fastmcp import FastMCP
 
+# Prefer orjson for serializing resources when it is installed
+try:
+    import orjson
+
+    def _dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+
+    def _dumps(obj: Any) -> str:
+        return json.dumps(obj)
+
+
 # Workaround for os.getlogin issues in some environments
 os.getlogin = getpass.getuser
 
@@ -77,26 +90,93 @@ attachments = {
 # Track newly created resources
 custom_resources = {}
 
+# Every document, seeded and custom, in creation order
+all_documents = dict(documents)
+
+# Search indexes, updated by _index_document whenever a document is added:
+# - _blob_parts: every document's lowercased title, content and tags, each
+#   field followed by DOC_SEPARATOR, with _blob_starts giving where each
+#   document begins in the joined blob and _blob_ids its ID
+# - _tag_index: document IDs by tag
+# - _doc_position: each document's position in creation order
+DOC_SEPARATOR = "\x1f"
+_blob_parts: List[str] = []
+_blob_size = 0
+_blob_starts: List[int] = []
+_blob_ids: List[str] = []
+_tag_index: Dict[str, Dict[str, None]] = {}
+_doc_position: Dict[str, int] = {}
+
+
+def _index_document(doc: Dict[str, Any]) -> None:
+    """Add a document to the search indexes"""
+    global _blob_size, _search_blob
+    doc_id = doc["id"]
+    text = "".join(
+        field.replace(DOC_SEPARATOR, " ") + DOC_SEPARATOR
+        for field in (doc["title"], doc["content"], *doc["tags"])
+    ).lower()
+    _blob_starts.append(_blob_size)
+    _blob_ids.append(doc_id)
+    _blob_parts.append(text)
+    _blob_size += len(text)
+    _search_blob = None
+    for tag in doc["tags"]:
+        _tag_index.setdefault(tag, {})[doc_id] = None
+    _doc_position[doc_id] = len(_doc_position)
+
+
+# The joined _blob_parts, rebuilt on the first search after a document is added
+_search_blob: Optional[str] = None
+
+
+def _get_search_blob() -> str:
+    """Return the joined search blob, joining the parts if it is stale"""
+    global _search_blob
+    if _search_blob is None:
+        _search_blob = "".join(_blob_parts)
+    return _search_blob
+
+
+for doc in documents.values():
+    _index_document(doc)
+
+# Serialized documents and attachments by ID, filled on first read (seeded at
+# import for the sample data) and dropped when a document changes
+_document_json = {doc_id: _dumps(doc) for doc_id, doc in documents.items()}
+_attachment_json = {
+    attachment_id: _dumps(attachment)
+    for attachment_id, attachment in attachments.items()
+}
+
 
 # Define resource handlers
 @mcp.resource("documents/{doc_id}")
 def get_document(doc_id: str) -> str:
     """Get a document by ID"""
-    if doc_id in documents:
-        return json.dumps(documents[doc_id])
-    elif doc_id in custom_resources:
-        return json.dumps(custom_resources[doc_id])
-    else:
-        return json.dumps({"error": f"Document not found: {doc_id}"})
+    cached = _document_json.get(doc_id)
+    if cached is None:
+        doc = all_documents.get(doc_id)
+        if doc is None:
+            return _dumps({"error": f"Document not found: {doc_id}"})
+        cached = _dumps(doc)
+        _document_json[doc_id] = cached
+
+    return cached
 
 
 @mcp.resource("attachments/{attachment_id}")
 def get_attachment(attachment_id: str) -> str:
     """Get an attachment by ID"""
-    if attachment_id in attachments:
-        return json.dumps(attachments[attachment_id])
-    else:
-        return json.dumps({"error": f"Attachment not found: {attachment_id}"})
+    cached = _attachment_json.get(attachment_id)
+    if cached is None:
+        attachment = attachments.get(attachment_id)
+        if attachment is None:
+            return _dumps({"error": f"Attachment not found: {attachment_id}"})
+        cached = _dumps(attachment)
+        _attachment_json[attachment_id] = cached
+
+    return cached
 
 
 # Helper function for embedding resources
@@ -124,12 +204,10 @@ def get_document_with_attachments(doc_id: str) -> Dict[str, Any]:
     This demonstrates how resources can be embedded directly in responses,
     reducing the need for multiple requests.
     """
-    # Check if document exists
-    if doc_id not in documents and doc_id not in custom_resources:
-        return {"error": f"Document not found: {doc_id}"}
-
     # Get the document
-    doc = documents.get(doc_id) or custom_resources.get(doc_id)
+    doc = all_documents.get(doc_id)
+    if doc is None:
+        return {"error": f"Document not found: {doc_id}"}
 
     # Create a response with embedded resources
     response = {"document": doc, "embedded_attachments": []}
@@ -165,14 +243,18 @@ def search_documents(query: str, embed_results: bool = True) -> Dict[str, Any]:
     matches = []
 
     # Perform a simple search (case-insensitive substring match)
+    # over the joined blob: after each hit, resume at the next document
     query = query.lower()
-    for doc_id, doc in {**documents, **custom_resources}.items():
-        if (
-            query in doc["title"].lower()
-            or query in doc["content"].lower()
-            or any(query in tag.lower() for tag in doc["tags"])
-        ):
-            matches.append(doc_id)
+    if DOC_SEPARATOR not in query:
+        search_blob = _get_search_blob()
+        blob_end = len(search_blob)
+        pos = search_blob.find(query)
+        while 0 <= pos < blob_end:
+            index = bisect_right(_blob_starts, pos) - 1
+            matches.append(_blob_ids[index])
+            if index + 1 == len(_blob_starts):
+                break
+            pos = search_blob.find(query, _blob_starts[index + 1])
 
     # Prepare response
     response = {
@@ -186,7 +268,7 @@ def search_documents(query: str, embed_results: bool = True) -> Dict[str, Any]:
         embedded_docs = []
 
         for doc_id in matches:
-            doc = documents.get(doc_id) or custom_resources.get(doc_id)
+            doc = all_documents[doc_id]
 
             # Create embedded resource
             embedded_doc = create_embedded_resource(
@@ -227,6 +309,8 @@ def create_document(title: str, content: str, tags: List[str] = None) -> Dict[st
 
     # Store the document
     custom_resources[doc_id] = doc
+    all_documents[doc_id] = doc
+    _index_document(doc)
 
     # Return the document with its embedded URI
     return {
@@ -257,12 +341,10 @@ def create_attachment_for_document(
 
     Returns the document with the new attachment embedded.
     """
-    # Check if document exists
-    if doc_id not in documents and doc_id not in custom_resources:
-        return {"error": f"Document not found: {doc_id}"}
-
     # Get the document
-    doc = documents.get(doc_id) or custom_resources.get(doc_id)
+    doc = all_documents.get(doc_id)
+    if doc is None:
+        return {"error": f"Document not found: {doc_id}"}
 
     # Generate a new attachment ID
     attachment_id = f"custom-att-{str(uuid.uuid4())[:8]}"
@@ -281,10 +363,8 @@ def create_attachment_for_document(
     attachments[attachment_id] = attachment
 
     # Update the document to reference the new attachment
-    if doc_id in documents:
-        documents[doc_id]["attachments"].append(attachment_id)
-    else:
-        custom_resources[doc_id]["attachments"].append(attachment_id)
+    doc["attachments"].append(attachment_id)
+    _document_json.pop(doc_id, None)
 
     # Return the result with embedded resources
     return {
@@ -311,41 +391,32 @@ def get_related_documents(doc_id: str, max_results: int = 5) -> Dict[str, Any]:
     This demonstrates how complex resource relationships can be presented
     with embedded resources.
     """
-    # Check if document exists
-    if doc_id not in documents and doc_id not in custom_resources:
-        return {"error": f"Document not found: {doc_id}"}
-
     # Get the document
-    doc = documents.get(doc_id) or custom_resources.get(doc_id)
-    doc_tags = set(doc["tags"])
-
-    # Find related documents based on tag overlap
-    related = []
-
-    for related_id, related_doc in {**documents, **custom_resources}.items():
-        if related_id == doc_id:
-            continue  # Skip the original document
-
-        # Calculate tag overlap
-        related_tags = set(related_doc["tags"])
-        overlap = len(doc_tags.intersection(related_tags))
-
-        if overlap > 0:
-            related.append(
-                {
-                    "doc_id": related_id,
-                    "overlap": overlap,
-                    "document": create_embedded_resource(
-                        uri=f"documents/{related_id}",
-                        content_type="application/json",
-                        content=related_doc,
-                    ),
-                }
-            )
-
-    # Sort by overlap (highest first) and limit results
-    related.sort(key=lambda x: x["overlap"], reverse=True)
-    related = related[:max_results]
+    doc = all_documents.get(doc_id)
+    if doc is None:
+        return {"error": f"Document not found: {doc_id}"}
+    # Count shared tags for every document that has at least one of them
+    overlaps: Dict[str, int] = {}
+    for tag in set(doc["tags"]):
+        for related_id in _tag_index[tag]:
+            overlaps[related_id] = overlaps.get(related_id, 0) + 1
+    overlaps.pop(doc_id, None)  # Skip the original document
+
+    # Order by overlap (highest first), keeping creation order among equals,
+    # and limit results
+    ranked = sorted(overlaps, key=lambda i: (-overlaps[i], _doc_position[i]))
+    related = [
+        {
+            "doc_id": related_id,
+            "overlap": overlaps[related_id],
+            "document": create_embedded_resource(
+                uri=f"documents/{related_id}",
+                content_type="application/json",
+                content=all_documents[related_id],
+            ),
+        }
+        for related_id in ranked[:max_results]
+    ]
 
     return {
         "document_id": doc_id,
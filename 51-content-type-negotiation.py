@@ -1,8 +1,10 @@
+import csv
 import getpass
 import io
 import json
 import os
 import sys
+import threading
 from base64 import b64encode
 from datetime import datetime
 from typing import Any, Dict
@@ -11,11 +13,26 @@ import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
 from mcp.server.fastmcp import FastMCP
-from PIL import Image
+from PIL import Image, ImageColor, ImageDraw
 
 # Disable GUI for matplotlib
 matplotlib.use("Agg")
 
+# Prefer orjson for encoding and decoding JSON when it is installed
+try:
+    import orjson
+
+    def _dumps(obj: Any, indent: bool = False) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+
+    _loads = orjson.loads
+except ImportError:
+
+    def _dumps(obj: Any, indent: bool = False) -> str:
+        return json.dumps(obj, indent=2 if indent else None)
+
+    _loads = json.loads
+
 # Workaround for os.getlogin issues in some environments
 os.getlogin = getpass.getuser
 
@@ -117,10 +134,10 @@ def get_markdown_content() -> str:
     return content
 
 
-@mcp.resource("content/data.json")
-def get_json_content() -> str:
-    """Get JSON data"""
-    data = {
+# Everything in content/data.json but the trailing timestamp, serialized once
+# without its closing brace
+JSON_CONTENT_HEAD = _dumps(
+    {
         "protocol": "MCP",
         "version": "2024-11-05",
         "content_types": list(CONTENT_TYPES.values()),
@@ -130,9 +147,16 @@ def get_json_content() -> str:
             "Embedded resources",
             "URI templates",
         ],
-        "timestamp": datetime.now().isoformat(),
-    }
-    return json.dumps(data, indent=2)
+    },
+    indent=True,
+).removesuffix("\n}")
+
+
+@mcp.resource("content/data.json")
+def get_json_content() -> str:
+    """Get JSON data"""
+    timestamp = _dumps(datetime.now().isoformat())
+    return f'{JSON_CONTENT_HEAD},\n  "timestamp": {timestamp}\n}}'
 
 
 @mcp.resource("content/page.html")
@@ -153,9 +177,24 @@ def get_svg_content() -> str:
     return SAMPLE_SVG
 
 
+# The plot never changes, so it is rendered on first request and reused
+_plot_png_b64: str | None = None
+_plot_lock = threading.Lock()
+
+
 @mcp.resource("content/plot.png")
 def get_plot_image() -> str:
-    """Generate and return a PNG plot image"""
+    """Return the PNG plot image, rendering it on first use"""
+    global _plot_png_b64
+    if _plot_png_b64 is None:
+        with _plot_lock:
+            if _plot_png_b64 is None:
+                _plot_png_b64 = _render_plot()
+    return _plot_png_b64
+
+
+def _render_plot() -> str:
+    """Render the sine and cosine plot as base64-encoded PNG data"""
     # Create a simple matplotlib plot
     plt.figure(figsize=(8, 6))
 
@@ -178,10 +217,9 @@ def get_plot_image() -> str:
     plt.savefig(buf, format="png")
     plt.close()
 
-    # Convert to base64
-    buf.seek(0)
-    img_data = buf.getvalue()
-    base64_data = b64encode(img_data).decode("utf-8")
+    # Convert to base64 straight from the buffer's memory
+    with buf.getbuffer() as img_data:
+        base64_data = b64encode(img_data).decode("ascii")
 
     # Return the base64-encoded PNG data
     return base64_data
@@ -205,14 +243,14 @@ def get_custom_resource(filename: str) -> (str, str):
 
     # Generate content based on extension
     if ext == "json":
-        content = json.dumps(
+        content = _dumps(
             {
                 "filename": filename,
                 "type": "json",
                 "custom": True,
                 "timestamp": datetime.now().isoformat(),
             },
-            indent=2,
+            indent=True,
         )
     elif ext == "txt":
         content = (
@@ -347,14 +385,6 @@ def generate_image(
             "error": f"Shape '{shape}' not supported. Use 'rectangle', 'circle', or 'triangle'"
         }
 
-    # Create a blank image
-    image = Image.new("RGB", (width, height), (255, 255, 255))
-
-    # Create drawing context
-    from PIL import ImageDraw
-
-    draw = ImageDraw.Draw(image)
-
     # Determine the color
     try:
         # Handle hex codes
@@ -367,29 +397,39 @@ def generate_image(
             color_tuple = color
     except:
         color_tuple = "blue"  # Default if parsing fails
+    if isinstance(color_tuple, str):
+        color_tuple = ImageColor.getcolor(color_tuple, "RGB")
 
     # Draw the requested shape
-    if shape == "rectangle":
-        draw.rectangle([(10, 10), (width - 10, height - 10)], fill=color_tuple)
-    elif shape == "circle":
-        draw.ellipse([(10, 10), (width - 10, height - 10)], fill=color_tuple)
-    elif shape == "triangle":
+    if shape == "triangle":
         # Create a triangle that fits within the image
+        image = Image.new("RGB", (width, height), (255, 255, 255))
         points = [
             (width // 2, 10),  # Top
             (10, height - 10),  # Bottom left
             (width - 10, height - 10),  # Bottom right
         ]
-        draw.polygon(points, fill=color_tuple)
+        ImageDraw.Draw(image).polygon(points, fill=color_tuple)
+    else:
+        # Fill rectangles and ellipses directly in a pixel array, covering the
+        # box from (10, 10) to (width - 10, height - 10) inclusive
+        pixels = np.full((height, width, 3), 255, dtype=np.uint8)
+        if shape == "rectangle":
+            pixels[10 : height - 9, 10 : width - 9] = color_tuple
+        elif width >= 20 and height >= 20:
+            y, x = np.ogrid[:height, :width]
+            rx, ry = (width - 19) / 2, (height - 19) / 2
+            inside = ((x - width / 2) / rx) ** 2 + ((y - height / 2) / ry) ** 2 <= 1
+            pixels[inside] = color_tuple
+        image = Image.fromarray(pixels)
 
     # Save the image to a bytes buffer
     buf = io.BytesIO()
     image.save(buf, format=format)
-    buf.seek(0)
 
-    # Get the binary data and encode as base64
-    img_data = buf.getvalue()
-    base64_data = b64encode(img_data).decode("utf-8")
+    # Encode the binary data as base64 straight from the buffer's memory
+    with buf.getbuffer() as img_data:
+        base64_data = b64encode(img_data).decode("ascii")
 
     # Determine content type
     content_type = f"image/{format}"
@@ -423,20 +463,22 @@ def convert_content_type(content: str, from_type: str, to_type: str) -> Dict[str
     if from_type == "application/json" and to_type == "text/csv":
         try:
             # Parse JSON
-            data = json.loads(content)
+            data = _loads(content)
 
             # Handle various JSON structures
             if isinstance(data, list) and len(data) > 0 and isinstance(data[0], dict):
                 # Array of objects - use keys from first object as headers
                 headers = data[0].keys()
 
-                # Create CSV
-                csv_lines = [",".join(headers)]
-                for item in data:
-                    row = [str(item.get(header, "")) for header in headers]
-                    csv_lines.append(",".join(row))
+                # Create CSV, quoting fields that need it
+                buf = io.StringIO()
+                writer = csv.writer(buf, lineterminator="\n")
+                writer.writerow(headers)
+                writer.writerows(
+                    [item.get(header, "") for header in headers] for item in data
+                )
 
-                result = "\n".join(csv_lines)
+                result = buf.getvalue().removesuffix("\n")
                 return {
                     "original_type": from_type,
                     "converted_type": to_type,
@@ -451,18 +493,15 @@ def convert_content_type(content: str, from_type: str, to_type: str) -> Dict[str
     elif from_type == "text/csv" and to_type == "application/json":
         try:
             # Parse CSV
-            lines = content.strip().split("\n")
-            headers = lines[0].split(",")
+            reader = csv.reader(io.StringIO(content.strip()))
+            headers = next(reader, [""])
 
             # Create JSON
-            data = []
-            for line in lines[1:]:
-                values = line.split(",")
-                if len(values) == len(headers):
-                    row = {headers[i]: values[i] for i in range(len(headers))}
-                    data.append(row)
-
-            result = json.dumps(data, indent=2)
+            data = [
+                dict(zip(headers, row)) for row in reader if len(row) == len(headers)
+            ]
+
+            result = _dumps(data, indent=True)
             return {
                 "original_type": from_type,
                 "converted_type": to_type,